@@ -13,6 +13,7 @@ from src.routes.noticias import noticias_bp
 from src.routes.prediccion import prediccion_bp
 from src.routes.recomendaciones import recomendaciones_bp
 from src.routes.dashboard_interactivo import dashboard_bp
+from src.services import market_data
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -29,6 +30,9 @@ app.register_blueprint(prediccion_bp)
 app.register_blueprint(recomendaciones_bp)
 app.register_blueprint(dashboard_bp)
 
+# Refrescar en segundo plano los símbolos más consultados
+market_data.start_background_refresh()
+
 # uncomment if you need to use database
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
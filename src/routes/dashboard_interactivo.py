@@ -1,11 +1,10 @@
 from flask import Blueprint, request, jsonify, session
-import yfinance as yf
 import numpy as np
-import pandas as pd
 import plotly.graph_objs as go
 import plotly.utils
 from datetime import datetime, timedelta
 import json
+from src.services import market_data
 
 dashboard_bp = Blueprint('dashboard_interactivo', __name__)
 
@@ -151,6 +150,13 @@ def dashboard_interactivo():
             }
             
             function displayDashboard(data) {
+                // Informar de los símbolos que no se pudieron cargar
+                const failed = Object.keys(data.failed_symbols || {});
+                if (failed.length > 0) {
+                    document.getElementById('error').textContent = 'No se pudieron obtener datos de: ' + failed.join(', ');
+                    document.getElementById('error').style.display = 'block';
+                }
+                
                 // Mostrar métricas generales
                 displayMetricsOverview(data.metrics);
                 
@@ -352,26 +358,33 @@ def api_dashboard_data():
         if not symbol:
             return jsonify({'success': False, 'message': 'Símbolo requerido'})
         
-        # Limpiar símbolos de comparación
+        # Limpiar símbolos de comparación (sin duplicados ni el símbolo principal)
         compare_symbols = [s.strip() for s in compare_symbols if s.strip()]
+        compare_symbols = [s for s in dict.fromkeys(compare_symbols) if s != symbol]
         
         # Obtener datos principales
-        main_ticker = yf.Ticker(symbol)
-        main_data = main_ticker.history(period=time_range)
-        main_info = main_ticker.info
+        main_data = market_data.get_history(symbol, period=time_range)
+        main_info = market_data.get_info(symbol)
         
         if main_data.empty:
             return jsonify({'success': False, 'message': 'No se pudieron obtener datos'})
         
+        # Descargar cada símbolo una sola vez y reutilizarlo en todos los gráficos
+        frames = {symbol: main_data}
+        compare_frames, failed_symbols = market_data.get_histories(compare_symbols, period=time_range)
+        frames.update(compare_frames)
+        
         # Preparar datos del dashboard
         dashboard_data = {
             'metrics': create_metrics_overview(main_data, main_info, symbol),
             'main_chart': create_main_chart_data(main_data, symbol),
-            'comparison_chart': create_comparison_chart_data(symbol, compare_symbols, time_range),
+            'comparison_chart': create_comparison_chart_data(frames),
             'volume_chart': create_volume_chart_data(main_data, symbol),
             'technical_chart': create_technical_chart_data(main_data, symbol),
             'returns_chart': create_returns_chart_data(main_data, symbol),
-            'correlation_chart': create_correlation_chart_data([symbol] + compare_symbols, time_range)
+            'correlation_chart': create_correlation_chart_data(frames),
+            'failed_symbols': failed_symbols,
+            'stale': any(market_data.is_stale(frame) for frame in frames.values())
         }
         
         return jsonify({'success': True, 'data': dashboard_data})
@@ -388,8 +401,7 @@ def api_export_dashboard():
         time_range = data.get('time_range', '6mo')
         
         # Obtener datos
-        ticker = yf.Ticker(symbol)
-        hist_data = ticker.history(period=time_range)
+        hist_data = market_data.get_history(symbol, period=time_range)
         
         # Crear CSV
         csv_data = hist_data.to_csv()
@@ -485,34 +497,28 @@ def create_main_chart_data(data, symbol):
         ]
     }
 
-def create_comparison_chart_data(main_symbol, compare_symbols, time_range):
+def create_comparison_chart_data(frames):
     """Crear datos de comparación de rendimientos"""
-    all_symbols = [main_symbol] + compare_symbols
     colors = ['#007bff', '#28a745', '#dc3545', '#ffc107', '#6f42c1']
     
     traces = []
     
-    for i, symbol in enumerate(all_symbols):
-        try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period=time_range)
-            
-            if not data.empty:
-                # Calcular rendimientos acumulados
-                returns = data['Close'].pct_change().fillna(0)
-                cumulative_returns = (1 + returns).cumprod() - 1
-                cumulative_returns_percent = cumulative_returns * 100
-                
-                dates = [date.strftime('%Y-%m-%d') for date in data.index]
-                
-                traces.append({
-                    'x': dates,
-                    'y': cumulative_returns_percent.tolist(),
-                    'name': symbol,
-                    'color': colors[i % len(colors)]
-                })
-        except:
-            continue
+    # Todos los símbolos comparten el mismo índice de fechas
+    closes = market_data.align_closes(frames)
+    dates = [date.strftime('%Y-%m-%d') for date in closes.index]
+    
+    for i, symbol in enumerate(closes.columns):
+        # Calcular rendimientos acumulados
+        returns = closes[symbol].pct_change().fillna(0)
+        cumulative_returns = (1 + returns).cumprod() - 1
+        cumulative_returns_percent = cumulative_returns * 100
+        
+        traces.append({
+            'x': dates,
+            'y': cumulative_returns_percent.tolist(),
+            'name': symbol,
+            'color': colors[i % len(colors)]
+        })
     
     return {
         'title': 'Comparación de Rendimientos',
@@ -571,22 +577,12 @@ def create_returns_chart_data(data, symbol):
         'x': daily_returns.tolist()
     }
 
-def create_correlation_chart_data(symbols, time_range):
+def create_correlation_chart_data(frames):
     """Crear datos de correlación"""
     try:
-        # Obtener datos de todos los símbolos
-        price_data = {}
-        
-        for symbol in symbols:
-            try:
-                ticker = yf.Ticker(symbol)
-                data = ticker.history(period=time_range)
-                if not data.empty:
-                    price_data[symbol] = data['Close']
-            except:
-                continue
+        df = market_data.align_closes(frames)
         
-        if len(price_data) < 2:
+        if len(df.columns) < 2:
             return {
                 'title': 'Correlación (datos insuficientes)',
                 'x': [],
@@ -594,8 +590,7 @@ def create_correlation_chart_data(symbols, time_range):
                 'z': []
             }
         
-        # Crear DataFrame y calcular correlación
-        df = pd.DataFrame(price_data)
+        # Calcular correlación
         correlation_matrix = df.corr()
         
         return {
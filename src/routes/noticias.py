@@ -1,9 +1,9 @@
 from flask import Blueprint, request, jsonify, session
-import yfinance as yf
 import requests
 from bs4 import BeautifulSoup
 import re
 from datetime import datetime, timedelta
+from src.services import market_data
 
 noticias_bp = Blueprint('noticias', __name__)
 
@@ -151,9 +151,7 @@ def api_analyze_news():
             return jsonify({'success': False, 'message': 'Símbolo requerido'})
         
         # Obtener información de la empresa
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        company_name = info.get('longName', symbol)
+        company_name = market_data.get_company_name(symbol)
         
         # Simular análisis de noticias (en producción usarías APIs de noticias reales)
         news_data = generate_sample_news(symbol, company_name)
@@ -1,10 +1,15 @@
-from flask import Blueprint, request, jsonify, session
-import yfinance as yf
+from flask import Blueprint, Response, request, jsonify, session
+from src.services import market_data
+from src.services.quote_stream import QuoteHub
 import json
+import queue
 from datetime import datetime
 
 precios_bp = Blueprint('precios', __name__)
 
+MAX_BATCH_SYMBOLS = 200
+STREAM_KEEPALIVE = 15
+
 def require_login(f):
     def decorated_function(*args, **kwargs):
         if 'user' not in session:
@@ -64,7 +69,7 @@ def precios_tiempo_real():
         </div>
         
         <script>
-            let autoUpdateInterval = null;
+            let quoteStream = null;
             
             async function getStockPrice() {
                 const symbol = document.getElementById('stockSymbol').value.trim().toUpperCase();
@@ -130,13 +135,33 @@ def precios_tiempo_real():
             function startAutoUpdate() {
                 const btn = document.getElementById('autoBtn');
                 
-                if (autoUpdateInterval) {
-                    clearInterval(autoUpdateInterval);
-                    autoUpdateInterval = null;
+                if (quoteStream) {
+                    quoteStream.close();
+                    quoteStream = null;
                     btn.textContent = 'Auto-actualizar';
                     btn.style.backgroundColor = '#007bff';
                 } else {
-                    autoUpdateInterval = setInterval(getStockPrice, 10000); // Cada 10 segundos
+                    const symbol = document.getElementById('stockSymbol').value.trim().toUpperCase();
+                    if (!symbol) {
+                        alert('Por favor ingrese un símbolo');
+                        return;
+                    }
+                    
+                    // El servidor envía las actualizaciones (cada 10 segundos)
+                    quoteStream = new EventSource('/api/stock-stream?symbols=' + encodeURIComponent(symbol));
+                    quoteStream.onmessage = function(event) {
+                        const quote = JSON.parse(event.data)[symbol];
+                        if (!quote) {
+                            return;
+                        }
+                        if (quote.success) {
+                            document.getElementById('error').style.display = 'none';
+                            displayStockInfo(quote.data);
+                        } else {
+                            document.getElementById('error').textContent = quote.message;
+                            document.getElementById('error').style.display = 'block';
+                        }
+                    };
                     btn.textContent = 'Detener auto-actualización';
                     btn.style.backgroundColor = '#dc3545';
                 }
@@ -159,34 +184,119 @@ def api_stock_price():
         if not symbol:
             return jsonify({'success': False, 'message': 'Símbolo requerido'})
         
-        # Obtener datos de yfinance
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        hist = ticker.history(period="2d")
+        # Obtener datos de mercado
+        hist = market_data.get_history(symbol, period="2d", priority=market_data.PRIORITY_INTERACTIVE)
         
         if hist.empty:
             return jsonify({'success': False, 'message': 'Símbolo no encontrado'})
         
-        current_price = hist['Close'].iloc[-1]
-        previous_price = hist['Close'].iloc[-2] if len(hist) > 1 else current_price
+        stock_data = build_stock_data(symbol, hist, market_data.get_company_name(symbol))
         
-        change = current_price - previous_price
-        change_percent = (change / previous_price) * 100 if previous_price != 0 else 0
+        return jsonify({'success': True, 'data': stock_data})
         
-        stock_data = {
-            'symbol': symbol,
-            'name': info.get('longName', symbol),
-            'price': float(current_price),
-            'change': float(change),
-            'changePercent': float(change_percent),
-            'volume': int(hist['Volume'].iloc[-1]),
-            'dayHigh': float(hist['High'].iloc[-1]),
-            'dayLow': float(hist['Low'].iloc[-1]),
-            'timestamp': datetime.now().isoformat()
-        }
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@precios_bp.route('/api/stock-prices', methods=['POST'])
+@require_login
+def api_stock_prices():
+    try:
+        data = request.get_json()
+        symbols = data.get('symbols', [])
+        if isinstance(symbols, str):
+            symbols = symbols.split(',')
         
-        return jsonify({'success': True, 'data': stock_data})
+        symbols = [market_data.normalize_symbol(s) for s in symbols]
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        
+        if not symbols:
+            return jsonify({'success': False, 'message': 'Símbolos requeridos'})
+        
+        if len(symbols) > MAX_BATCH_SYMBOLS:
+            return jsonify({'success': False, 'message': f'Máximo {MAX_BATCH_SYMBOLS} símbolos por petición'})
+        
+        quotes = fetch_quotes(symbols)
+        results = [dict(symbol=symbol, **quotes[symbol]) for symbol in symbols]
+        
+        return jsonify({'success': True, 'data': results})
         
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
 
+@precios_bp.route('/api/stock-stream')
+@require_login
+def api_stock_stream():
+    symbols = request.args.get('symbols', '').split(',')
+    symbols = [market_data.normalize_symbol(s) for s in symbols]
+    symbols = list(dict.fromkeys(s for s in symbols if s))
+    
+    if not symbols:
+        return jsonify({'success': False, 'message': 'Símbolos requeridos'})
+    
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        return jsonify({'success': False, 'message': f'Máximo {MAX_BATCH_SYMBOLS} símbolos por petición'})
+    
+    def stream():
+        subscriber = quote_hub.subscribe(symbols)
+        try:
+            while True:
+                try:
+                    update = subscriber.queue.get(timeout=STREAM_KEEPALIVE)
+                except queue.Empty:
+                    # Comentario SSE para mantener viva la conexión
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'data: {json.dumps(update)}\n\n'
+        finally:
+            quote_hub.unsubscribe(subscriber)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def fetch_quotes(symbols, refresh=False):
+    """Obtener la cotización de varios símbolos: dict símbolo -> {success, data | message}"""
+    # Una sola descarga para las dos últimas barras de todos los símbolos
+    frames, errors = market_data.get_histories_batch(symbols, period="2d", refresh=refresh)
+    # Los nombres no bloquean las cotizaciones: los que faltan se cargan en segundo plano
+    names = market_data.get_cached_company_names(list(frames))
+    
+    quotes = {}
+    for symbol in symbols:
+        if symbol in frames:
+            quotes[symbol] = {
+                'success': True,
+                'data': build_stock_data(symbol, frames[symbol], names.get(symbol, symbol))
+            }
+        else:
+            quotes[symbol] = {
+                'success': False,
+                'message': errors.get(symbol, 'Símbolo no encontrado')
+            }
+    
+    return quotes
+
+def build_stock_data(symbol, hist, name):
+    """Crear el resumen de cotización a partir de las dos últimas barras"""
+    current_price = hist['Close'].iloc[-1]
+    previous_price = hist['Close'].iloc[-2] if len(hist) > 1 else current_price
+    
+    change = current_price - previous_price
+    change_percent = (change / previous_price) * 100 if previous_price != 0 else 0
+    
+    return {
+        'symbol': symbol,
+        'name': name,
+        'price': float(current_price),
+        'change': float(change),
+        'changePercent': float(change_percent),
+        'volume': int(hist['Volume'].iloc[-1]),
+        'dayHigh': float(hist['High'].iloc[-1]),
+        'dayLow': float(hist['Low'].iloc[-1]),
+        'timestamp': datetime.now().isoformat(),
+        'stale': market_data.is_stale(hist)
+    }
+
+# El hub refresca sin caché: cada intervalo trae la cotización más reciente
+quote_hub = QuoteHub(lambda symbols: fetch_quotes(symbols, refresh=True))
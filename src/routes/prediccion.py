@@ -1,19 +1,42 @@
-from flask import Blueprint, request, jsonify, session
-import yfinance as yf
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.metrics import mean_squared_error
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
 import json
+import os
 from datetime import datetime, timedelta
+# forecasting (TensorFlow) se importa solo al usar el LSTM para que el arranque sea rápido
+from src.services import light_forecasting, market_data
+from src.services.cache import TTLCache
+from src.services.model_registry import MODEL_DIR, ModelRegistry, global_model_key, model_key
+from src.services.training_jobs import TrainingPool
 import warnings
 warnings.filterwarnings('ignore')
 
 prediccion_bp = Blueprint('prediccion', __name__)
 
+SEQUENCE_LENGTH = 60  # Usar 60 días para predecir el siguiente
+MODEL_CACHE_SIZE = int(os.environ.get('PREDICTION_MODEL_CACHE_SIZE', 8))
+# Entrenamientos simultáneos como máximo; el resto espera en cola
+TRAINING_WORKERS = int(os.environ.get('PREDICTION_TRAINING_WORKERS', 1))
+TRAINING_JOB_TTL = int(os.environ.get('PREDICTION_TRAINING_JOB_TTL', 3600))
+# Modelos neuronales: LSTM por símbolo y modelo global entrenado con muchos símbolos
+NEURAL_MODELS = ('lstm', 'global')
+# Modelo si la petición no indica otro: uno de NEURAL_MODELS o de los ligeros ('linear', 'ets', 'gbm')
+DEFAULT_MODEL = os.environ.get('PREDICTION_DEFAULT_MODEL', 'lstm')
+MAX_BATCH_SYMBOLS = 50
+# Intervalos de predicción por Monte Carlo dropout: trayectorias por símbolo y percentiles devueltos
+INTERVAL_SAMPLES = int(os.environ.get('PREDICTION_INTERVAL_SAMPLES', 100))
+MAX_INTERVAL_SAMPLES = 1000
+INTERVAL_PERCENTILES = (5, 25, 50, 75, 95)
+# Respuestas de predicción guardadas; una barra nueva cambia la clave, así que no necesitan TTL
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_RESULT_CACHE_SIZE', 256))
+
+# Modelos entrenados por (símbolo, período, longitud de secuencia, última barra)
+model_registry = ModelRegistry(MODEL_DIR, cache_size=MODEL_CACHE_SIZE)
+training_pool = TrainingPool(max_workers=TRAINING_WORKERS, job_ttl=TRAINING_JOB_TTL)
+# Predicciones por (símbolo, período, días, modelo, versión del modelo, última barra)
+prediction_cache = TTLCache(maxsize=PREDICTION_CACHE_SIZE, ttl=float('inf'))
+
 def require_login(f):
     def decorated_function(*args, **kwargs):
         if 'user' not in session:
@@ -71,6 +94,13 @@ def prediccion_lstm():
                     <option value="2y" selected>2 años</option>
                     <option value="5y">5 años</option>
                 </select>
+                <select id="modelType" class="form-input">
+                    <option value="lstm" selected>LSTM</option>
+                    <option value="global">LSTM global</option>
+                    <option value="linear">Autorregresivo lineal</option>
+                    <option value="ets">Suavizado exponencial</option>
+                    <option value="gbm">Gradient boosting</option>
+                </select>
                 <button onclick="predictPrices()" class="btn" id="predictBtn">Generar Predicción</button>
             </div>
             
@@ -87,7 +117,7 @@ def prediccion_lstm():
             <div id="metricsContainer" class="metrics" style="display: none;"></div>
             
             <div id="chartContainer" class="chart-container"></div>
-            <div id="loading" class="loading" style="display: none;">Entrenando modelo LSTM y generando predicciones...</div>
+            <div id="loading" class="loading" style="display: none;">Entrenando modelo y generando predicciones...</div>
             <div id="error" style="color: red; display: none;"></div>
         </div>
         
@@ -96,6 +126,7 @@ def prediccion_lstm():
                 const symbol = document.getElementById('stockSymbol').value.trim().toUpperCase();
                 const predictionDays = parseInt(document.getElementById('predictionDays').value);
                 const trainingPeriod = document.getElementById('trainingPeriod').value;
+                const modelType = document.getElementById('modelType').value;
                 
                 if (!symbol) {
                     alert('Por favor ingrese un símbolo');
@@ -119,11 +150,19 @@ def prediccion_lstm():
                         body: JSON.stringify({ 
                             symbol: symbol,
                             prediction_days: predictionDays,
-                            training_period: trainingPeriod
+                            training_period: trainingPeriod,
+                            model: modelType,
+                            intervals: modelType === 'lstm' || modelType === 'global',
+                            async: true
                         })
                     });
                     
-                    const data = await response.json();
+                    let data = await response.json();
+                    
+                    // Si hay que entrenar el modelo, consultar el trabajo hasta que termine
+                    if (data.success && data.job_id) {
+                        data = await waitForJob(data.job_id);
+                    }
                     
                     if (data.success) {
                         displayPredictionResults(data.data);
@@ -140,11 +179,31 @@ def prediccion_lstm():
                 }
             }
             
+            const MODEL_NAMES = {
+                lstm: 'LSTM',
+                global: 'LSTM global',
+                linear: 'Autorregresivo lineal',
+                ets: 'Suavizado exponencial',
+                gbm: 'Gradient boosting'
+            };
+            
+            async function waitForJob(jobId) {
+                while (true) {
+                    await new Promise(resolve => setTimeout(resolve, 2000));
+                    const response = await fetch('/api/predict-lstm/jobs/' + jobId);
+                    const data = await response.json();
+                    if (!data.success || data.status === 'done') {
+                        return data;
+                    }
+                }
+            }
+            
             function displayPredictionResults(data) {
                 // Mostrar resumen
                 const summaryContent = document.getElementById('summaryContent');
                 summaryContent.innerHTML = 
                     '<strong>Empresa:</strong> ' + data.company_name + ' (' + data.symbol + ')<br>' +
+                    '<strong>Modelo:</strong> ' + MODEL_NAMES[data.model] + '<br>' +
                     '<strong>Período de entrenamiento:</strong> ' + data.training_period + '<br>' +
                     '<strong>Días de predicción:</strong> ' + data.prediction_days + '<br>' +
                     '<strong>Precio actual:</strong> $' + data.current_price.toFixed(2);
@@ -202,6 +261,21 @@ def prediccion_lstm():
                     '<div class="metric-label">Precisión</div>' +
                     '</div>';
                 
+                if (data.model_metrics.training_time !== undefined) {
+                    metricsContainer.innerHTML +=
+                        '<div class="metric-card">' +
+                        '<div class="metric-value">' + data.model_metrics.training_time.toFixed(2) + ' s</div>' +
+                        '<div class="metric-label">Tiempo de entrenamiento</div>' +
+                        '</div>';
+                }
+                if (data.model_metrics.epochs !== undefined) {
+                    metricsContainer.innerHTML +=
+                        '<div class="metric-card">' +
+                        '<div class="metric-value">' + data.model_metrics.epochs + '</div>' +
+                        '<div class="metric-label">Épocas</div>' +
+                        '</div>';
+                }
+                
                 document.getElementById('metricsContainer').style.display = 'grid';
                 
                 // Crear gráfico
@@ -223,13 +297,13 @@ def prediccion_lstm():
                     y: data.predicted_prices,
                     type: 'scatter',
                     mode: 'lines+markers',
-                    name: 'Predicción LSTM',
+                    name: 'Predicción ' + MODEL_NAMES[data.model],
                     line: { color: '#dc3545', width: 2, dash: 'dash' },
                     marker: { size: 6 }
                 };
                 
                 const layout = {
-                    title: 'Predicción de Precios con LSTM - ' + data.symbol,
+                    title: 'Predicción de Precios con ' + MODEL_NAMES[data.model] + ' - ' + data.symbol,
                     xaxis: { title: 'Fecha' },
                     yaxis: { title: 'Precio ($)' },
                     hovermode: 'x unified',
@@ -237,7 +311,30 @@ def prediccion_lstm():
                     height: 500
                 };
                 
-                Plotly.newPlot('chartContainer', [historicalTrace, predictionTrace], layout);
+                const traces = [historicalTrace];
+                // Banda entre los percentiles 5 y 95 de las trayectorias de Monte Carlo dropout
+                if (data.prediction_intervals) {
+                    traces.push({
+                        x: data.prediction_dates,
+                        y: data.prediction_intervals.p5,
+                        type: 'scatter',
+                        mode: 'lines',
+                        name: 'Percentil 5',
+                        line: { color: 'rgba(220, 53, 69, 0.3)', width: 1 }
+                    }, {
+                        x: data.prediction_dates,
+                        y: data.prediction_intervals.p95,
+                        type: 'scatter',
+                        mode: 'lines',
+                        name: 'Intervalo 90%',
+                        fill: 'tonexty',
+                        fillcolor: 'rgba(220, 53, 69, 0.15)',
+                        line: { color: 'rgba(220, 53, 69, 0.3)', width: 1 }
+                    });
+                }
+                traces.push(predictionTrace);
+                
+                Plotly.newPlot('chartContainer', traces, layout);
             }
             
             // Cargar predicción inicial
@@ -255,161 +352,401 @@ def api_predict_lstm():
         symbol = data.get('symbol', '').upper()
         prediction_days = data.get('prediction_days', 30)
         training_period = data.get('training_period', '1y')
+        model_name = data.get('model', DEFAULT_MODEL)
+        # Con async=true no se espera al entrenamiento: se devuelve un id de trabajo
+        run_async = bool(data.get('async', False))
+        # Con el modelo global, fine_tune=true usa una copia reajustada con el histórico del símbolo
+        fine_tune = bool(data.get('fine_tune', False))
+        # Con intervals=true se añaden percentiles de trayectorias de Monte Carlo dropout
+        samples = interval_samples(data)
         
         if not symbol:
             return jsonify({'success': False, 'message': 'Símbolo requerido'})
         
+        if model_name not in NEURAL_MODELS and model_name not in light_forecasting.ENGINES:
+            return jsonify({'success': False, 'message': f'Modelo no soportado: {model_name}'})
+        
+        if samples and model_name not in NEURAL_MODELS:
+            return jsonify({'success': False, 'message': 'Los intervalos solo están disponibles con los modelos LSTM'})
+        
         # Obtener datos históricos
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        company_name = info.get('longName', symbol)
+        company_name = market_data.get_company_name(symbol)
         
         # Obtener datos históricos para entrenamiento
-        hist_data = ticker.history(period=training_period)
+        hist_data = market_data.get_history(symbol, period=training_period, priority=market_data.PRIORITY_BACKGROUND)
         
         if hist_data.empty:
             return jsonify({'success': False, 'message': 'No se pudieron obtener datos históricos'})
         
-        # Preparar datos para LSTM
-        prices = hist_data['Close'].values.reshape(-1, 1)
+        # Los modelos ligeros se ajustan en la propia petición en milisegundos
+        if model_name in light_forecasting.ENGINES:
+            if len(hist_data) < light_forecasting.min_history(model_name):
+                return jsonify({'success': False, 'message': 'Datos insuficientes para entrenamiento'})
+            result = cached_prediction(
+                prediction_cache_key(symbol, training_period, prediction_days, model_name, None, hist_data),
+                lambda: build_light_prediction(model_name, symbol, company_name, training_period, prediction_days, hist_data)
+            )
+            return jsonify({'success': True, 'data': result})
         
-        # Normalizar datos
-        scaler = MinMaxScaler(feature_range=(0, 1))
-        scaled_data = scaler.fit_transform(prices)
+        if len(hist_data) <= SEQUENCE_LENGTH:
+            return jsonify({'success': False, 'message': 'Datos insuficientes para entrenamiento'})
         
-        # Crear secuencias para LSTM
-        sequence_length = 60  # Usar 60 días para predecir el siguiente
-        X, y = create_sequences(scaled_data, sequence_length)
+        # Reutilizar el modelo guardado; solo se entrena si cambian los datos o los parámetros
+        key, trained = find_neural_model(model_name, symbol, training_period, hist_data, fine_tune)
+        if trained is None:
+            job = submit_training(
+                key, model_name, company_name, training_period, prediction_days, hist_data, training_budget(data), samples
+            )
+            if run_async:
+                return jsonify({'success': True, 'job_id': job.id, 'status': job.status}), 202
+            job.future.result()
+            trained = load_trained_model(key)
         
-        if len(X) == 0:
-            return jsonify({'success': False, 'message': 'Datos insuficientes para entrenamiento'})
+        result = cached_prediction(
+            prediction_cache_key(symbol, training_period, prediction_days, model_name, trained.trained_at, hist_data, samples),
+            lambda: build_prediction(trained, model_name, symbol, company_name, training_period, prediction_days, hist_data, samples)
+        )
+        return jsonify({'success': True, 'data': result})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@prediccion_bp.route('/api/predict-lstm/jobs/<job_id>')
+@require_login
+def api_predict_lstm_job(job_id):
+    try:
+        job = training_pool.get(job_id)
+        if job is None or job.context['user'] != session['user']:
+            return jsonify({'success': False, 'message': 'Trabajo no encontrado'}), 404
+        
+        status = job.status
+        if status == 'failed':
+            return jsonify({'success': False, 'status': status, 'message': f'Error: {job.error}'})
+        if status != 'done':
+            return jsonify({'success': True, 'status': status})
+        
+        if job.result is None:
+            context = job.context
+            trained = load_trained_model(context['key'])
+            job.result = cached_prediction(
+                prediction_cache_key(
+                    context['key'][0], context['training_period'], context['prediction_days'],
+                    context['model_name'], trained.trained_at, context['hist_data'], context['samples']
+                ),
+                lambda: build_prediction(
+                    trained, context['model_name'], context['key'][0], context['company_name'],
+                    context['training_period'], context['prediction_days'], context['hist_data'], context['samples']
+                )
+            )
+        return jsonify({'success': True, 'status': status, 'data': job.result})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@prediccion_bp.route('/api/predict-batch', methods=['POST'])
+@require_login
+def api_predict_batch():
+    try:
+        data = request.get_json()
+        symbols = data.get('symbols', [])
+        if isinstance(symbols, str):
+            symbols = symbols.split(',')
+        prediction_days = data.get('prediction_days', 30)
+        training_period = data.get('training_period', '1y')
+        model_name = data.get('model', DEFAULT_MODEL)
+        fine_tune = bool(data.get('fine_tune', False))
+        samples = interval_samples(data)
+        # Con stream=true cada símbolo se envía como una línea JSON en cuanto está listo
+        stream = bool(data.get('stream', False))
         
-        # Dividir datos en entrenamiento y prueba
-        train_size = int(len(X) * 0.8)
-        X_train, X_test = X[:train_size], X[train_size:]
-        y_train, y_test = y[:train_size], y[train_size:]
+        symbols = [market_data.normalize_symbol(s) for s in symbols]
+        symbols = list(dict.fromkeys(s for s in symbols if s))
         
-        # Crear y entrenar modelo LSTM
-        model = create_lstm_model((sequence_length, 1))
-        model.fit(X_train, y_train, epochs=50, batch_size=32, verbose=0, validation_split=0.1)
+        if not symbols:
+            return jsonify({'success': False, 'message': 'Símbolos requeridos'})
         
-        # Evaluar modelo
-        train_predictions = model.predict(X_train)
-        test_predictions = model.predict(X_test)
+        if len(symbols) > MAX_BATCH_SYMBOLS:
+            return jsonify({'success': False, 'message': f'Máximo {MAX_BATCH_SYMBOLS} símbolos por petición'})
         
-        # Calcular métricas
-        train_mse = mean_squared_error(y_train, train_predictions)
-        test_mse = mean_squared_error(y_test, test_predictions)
-        rmse = np.sqrt(test_mse)
+        if model_name not in NEURAL_MODELS and model_name not in light_forecasting.ENGINES:
+            return jsonify({'success': False, 'message': f'Modelo no soportado: {model_name}'})
         
-        # Calcular precisión (porcentaje de predicciones dentro del 5% del valor real)
-        test_predictions_scaled = scaler.inverse_transform(test_predictions)
-        y_test_scaled = scaler.inverse_transform(y_test.reshape(-1, 1))
-        accuracy = np.mean(np.abs((test_predictions_scaled - y_test_scaled) / y_test_scaled) < 0.05)
+        if samples and model_name not in NEURAL_MODELS:
+            return jsonify({'success': False, 'message': 'Los intervalos solo están disponibles con los modelos LSTM'})
         
-        # Generar predicciones futuras
-        last_sequence = scaled_data[-sequence_length:].reshape(1, sequence_length, 1) # Asegurarse de que sea 3D para la primera predicción
-        future_predictions = []
+        frames, errors = market_data.get_histories(symbols, period=training_period, priority=market_data.PRIORITY_BACKGROUND)
+        company_names = market_data.get_company_names(list(frames))
+        budget = training_budget(data) if model_name in NEURAL_MODELS else None
+        results = iter_batch_predictions(
+            frames, errors, company_names, model_name, training_period, prediction_days, budget, fine_tune, samples
+        )
+        
+        if stream:
+            lines = (json.dumps(result) + '\n' for result in results)
+            return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+        return jsonify({'success': True, 'data': list(results)})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
 
-        # Generar predicciones futuras
-        # Asegurarse de que last_sequence sea 3D para la primera predicción
-        # last_sequence debe ser (1, sequence_length, 1) para el modelo
-        last_sequence = scaled_data[-sequence_length:].reshape(1, sequence_length, 1)
-        future_predictions = []
+def iter_batch_predictions(frames, errors, company_names, model_name, training_period, prediction_days, budget,
+                           fine_tune=False, samples=0):
+    """Generar el resultado de cada símbolo del lote a medida que está listo.
 
-        for _ in range(prediction_days):
-            # Realizar la predicción
-            next_pred = model.predict(last_sequence)
+    Con los modelos neuronales, los símbolos sin modelo guardado lanzan su
+    entrenamiento y devuelven el id del trabajo; el resto se agrupa por modelo
+    y cada grupo se predice con una sola ejecución (con el modelo global, todo
+    el lote a la vez).
+    """
+    for symbol, message in errors.items():
+        yield {'symbol': symbol, 'success': False, 'message': message}
+    
+    ready = []
+    for symbol, hist_data in frames.items():
+        company_name = company_names.get(symbol, symbol)
+        try:
+            if model_name in light_forecasting.ENGINES:
+                if len(hist_data) < light_forecasting.min_history(model_name):
+                    yield {'symbol': symbol, 'success': False, 'message': 'Datos insuficientes para entrenamiento'}
+                    continue
+                result = build_light_prediction(model_name, symbol, company_name, training_period, prediction_days, hist_data)
+                yield {'symbol': symbol, 'success': True, 'data': result}
+                continue
             
-            # La predicción es un array 2D, por ejemplo [[valor]], necesitamos solo el valor
-            predicted_value = next_pred[0, 0]
-            future_predictions.append(predicted_value)
-
-            # Actualizar la secuencia: quitar el primer elemento y añadir la nueva predicción
-            # 1. Quitar el primer elemento de la secuencia (desplazar la ventana)
-            # Esto toma todos los elementos excepto el primero a lo largo de la dimensión de la secuencia
-            # El resultado sigue siendo 3D: (1, sequence_length - 1, 1)
-            updated_sequence_part = last_sequence[:, 1:, :] 
+            if len(hist_data) <= SEQUENCE_LENGTH:
+                yield {'symbol': symbol, 'success': False, 'message': 'Datos insuficientes para entrenamiento'}
+                continue
             
-            # 2. Reformar el valor predicho para que sea compatible con la concatenación (3D)
-            # Debe tener la forma (1, 1, 1)
-            new_input_value = np.array([[[predicted_value]]], dtype=np.float32) # Aseguramos que sea 3D y float32
+            key, trained = find_neural_model(model_name, symbol, training_period, hist_data, fine_tune)
+            if trained is None:
+                job = submit_training(
+                    key, model_name, company_name, training_period, prediction_days, hist_data, budget, samples
+                )
+                yield {'symbol': symbol, 'success': True, 'job_id': job.id, 'status': job.status}
+            else:
+                ready.append((symbol, company_name, hist_data, trained))
+        except Exception as e:
+            yield {'symbol': symbol, 'success': False, 'message': f'Error: {str(e)}'}
+    
+    # Agrupar los símbolos que comparten modelo para predecirlos juntos
+    groups = {}
+    for item in ready:
+        groups.setdefault(id(item[3]), []).append(item)
+    
+    for group in groups.values():
+        trained = group[0][3]
+        try:
+            future_prices = forecast_lstm(trained, [item[2] for item in group], prediction_days)
+            intervals = [None] * len(group)
+            if samples:
+                intervals = forecast_intervals(trained, [item[2] for item in group], prediction_days, samples)
+        except Exception as e:
+            for symbol, _, _, _ in group:
+                yield {'symbol': symbol, 'success': False, 'message': f'Error: {str(e)}'}
+            continue
+        for (symbol, company_name, hist_data, _), prices, bands in zip(group, future_prices, intervals):
+            result = build_result(
+                symbol, company_name, training_period, prediction_days, hist_data,
+                prices, trained.metrics, model_name, trained.trained_at, bands
+            )
+            yield {'symbol': symbol, 'success': True, 'data': result}
 
-            # 3. Concatenar la secuencia desplazada con el nuevo valor predicho
-            # Concatenamos a lo largo del eje de los timesteps (axis=1)
-            last_sequence = np.concatenate((updated_sequence_part, new_input_value), axis=1)
+def training_budget(data):
+    """Segundos de entrenamiento permitidos, sin superar el límite configurado"""
+    from src.services import forecasting
+    return min(float(data.get('training_budget', forecasting.TRAINING_BUDGET)), forecasting.TRAINING_BUDGET)
 
-        # ... (resto del código)
-        # Desnormalizar predicciones
-        future_predictions = scaler.inverse_transform(np.array(future_predictions).reshape(-1, 1))
-        
-        # Preparar datos para respuesta
-        current_price = float(hist_data['Close'].iloc[-1])
-        predicted_price = float(future_predictions[-1][0])
-        
-        # Generar fechas para predicciones
-        last_date = hist_data.index[-1]
-        prediction_dates = [last_date + timedelta(days=i+1) for i in range(prediction_days)]
-        
-        # Calcular confianza del modelo
-        model_confidence = max(0.5, min(0.95, accuracy))
-        
-        # Generar recomendación
-        price_change_percent = (predicted_price - current_price) / current_price * 100
-        if price_change_percent > 5:
-            recommendation = "Considerar comprar o mantener posiciones existentes"
-        elif price_change_percent < -5:
-            recommendation = "Considerar vender o evitar nuevas posiciones"
+def interval_samples(data):
+    """Trayectorias de Monte Carlo dropout pedidas, o 0 si no se piden intervalos"""
+    if not data.get('intervals', False):
+        return 0
+    return max(10, min(int(data.get('samples', INTERVAL_SAMPLES)), MAX_INTERVAL_SAMPLES))
+
+def find_neural_model(model_name, symbol, training_period, hist_data, fine_tune=False):
+    """Modelo neuronal para el símbolo: (clave, modelo), con modelo None si hay que entrenarlo.
+
+    El modelo global se sirve tal cual salvo con fine_tune, que usa (o entrena)
+    una copia reajustada con el histórico del símbolo.
+    """
+    if model_name == 'global':
+        if not fine_tune:
+            return None, load_global_model()
+        training_period = f'{training_period}-global'
+    key = model_key(symbol, training_period, SEQUENCE_LENGTH, hist_data.index[-1])
+    return key, model_registry.load(key)
+
+def load_global_model():
+    """Última versión del modelo global entrenado fuera de línea"""
+    key = model_registry.latest(global_model_key(SEQUENCE_LENGTH))
+    trained = model_registry.load(key) if key is not None else None
+    if trained is None:
+        raise RuntimeError('Modelo global no disponible: entrénelo con python -m src.services.forecasting')
+    return trained
+
+def submit_training(key, model_name, company_name, training_period, prediction_days, hist_data, budget, samples=0):
+    """Enviar al pool de procesos el entrenamiento del modelo de la clave"""
+    from src.services import forecasting
+    prices = hist_data['Close'].values.reshape(-1, 1)
+    if model_name == 'global':
+        global_key = model_registry.latest(global_model_key(SEQUENCE_LENGTH))
+        if global_key is None:
+            raise RuntimeError('Modelo global no disponible: entrénelo con python -m src.services.forecasting')
+        task = (forecasting.fine_tune_global_and_store, MODEL_DIR, key, global_key, prices, SEQUENCE_LENGTH, budget)
+    else:
+        # Si hay una versión anterior del mismo modelo, se reajusta con las barras nuevas
+        previous_key = model_registry.latest(key)
+        new_bars = 0
+        if previous_key is not None and previous_key[3] < key[3]:
+            new_bars = int((hist_data.index.strftime('%Y-%m-%d') > previous_key[3]).sum())
         else:
-            recommendation = "Mantener posiciones actuales, tendencia neutral"
-        
-        result = {
-            'symbol': symbol,
+            previous_key = None
+        task = (forecasting.train_and_store, MODEL_DIR, key, prices, SEQUENCE_LENGTH, previous_key, new_bars, budget)
+    # El entrenamiento corre en el pool de procesos, nunca en el hilo de la petición
+    return training_pool.submit(
+        key, *task,
+        context={
+            'user': session['user'],
+            'key': key,
+            'model_name': model_name,
             'company_name': company_name,
-            'current_price': current_price,
-            'predicted_price': predicted_price,
-            'prediction_days': prediction_days,
             'training_period': training_period,
-            'model_confidence': model_confidence,
-            'recommendation': recommendation,
-            'model_metrics': {
-                'mse': float(test_mse),
-                'rmse': float(rmse),
-                'accuracy': float(accuracy)
-            },
-            'historical_dates': [date.strftime('%Y-%m-%d') for date in hist_data.index[-100:]],
-            'historical_prices': hist_data['Close'].iloc[-100:].tolist(),
-            'prediction_dates': [date.strftime('%Y-%m-%d') for date in prediction_dates],
-            'predicted_prices': [float(pred[0]) for pred in future_predictions],
-            'analysis_date': datetime.now().isoformat()
+            'hist_data': hist_data,
+            'prediction_days': prediction_days,
+            'samples': samples
         }
-        
-        return jsonify({'success': True, 'data': result})
-        
-    except Exception as e:
-        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+    )
+
+def prediction_cache_key(symbol, training_period, prediction_days, model_name, model_version, hist_data, samples=0):
+    """Clave de una predicción: cambia con el modelo reentrenado o con una barra nueva.
 
-def create_sequences(data, sequence_length):
-    """Crear secuencias para entrenamiento LSTM"""
-    X, y = [], []
-    for i in range(sequence_length, len(data)):
-        X.append(data[i-sequence_length:i, 0])
-        y.append(data[i, 0])
-    return np.array(X), np.array(y)
+    Se incluye el último cierre porque la barra del día en curso conserva su
+    fecha mientras el precio se actualiza.
+    """
+    return (
+        symbol, training_period, int(prediction_days), model_name, model_version, samples,
+        hist_data.index[-1].isoformat(), float(hist_data['Close'].iloc[-1])
+    )
 
-def create_lstm_model(input_shape):
-    """Crear modelo LSTM"""
-    model = Sequential([
-        LSTM(50, return_sequences=True, input_shape=input_shape),
-        Dropout(0.2),
-        LSTM(50, return_sequences=True),
-        Dropout(0.2),
-        LSTM(50),
-        Dropout(0.2),
-        Dense(1)
-    ])
+def cached_prediction(cache_key, build):
+    """Predicción guardada para la clave, o la construye y la guarda"""
+    result = prediction_cache.get(cache_key)
+    if result is None:
+        result = build()
+        # Las predicciones hechas con datos caducados no se reutilizan
+        if not result['stale']:
+            prediction_cache.set(cache_key, result)
+    return result
+
+def load_trained_model(key):
+    """Cargar del registro el modelo que acaba de entrenar el pool"""
+    trained = model_registry.load(key)
+    if trained is None:
+        raise RuntimeError('No se pudo cargar el modelo entrenado')
+    return trained
+
+def build_prediction(trained, model_name, symbol, company_name, training_period, prediction_days, hist_data, samples=0):
+    """Generar la predicción con un modelo neuronal ya entrenado"""
+    future_prices = forecast_lstm(trained, [hist_data], prediction_days)[0]
+    intervals = forecast_intervals(trained, [hist_data], prediction_days, samples)[0] if samples else None
+    return build_result(
+        symbol, company_name, training_period, prediction_days, hist_data,
+        future_prices, trained.metrics, model_name, trained.trained_at, intervals
+    )
+
+def forecast_lstm(trained, frames, prediction_days):
+    """Predecir varios históricos con el mismo modelo en una sola ejecución: lista de precios futuros"""
+    from src.services import forecasting
+    scaler = trained.scaler
+    # Los modelos sin escalador (global) normalizan cada ventana por sí mismos
+    series = [frame['Close'].values.reshape(-1, 1) for frame in frames]
+    if scaler is not None:
+        series = [scaler.transform(values) for values in series]
     
-    model.compile(optimizer='adam', loss='mean_squared_error')
-    return model
+    # Todas las series y todos los pasos en una sola ejecución del grafo
+    future_predictions = forecasting.forecast_batch(trained, series, SEQUENCE_LENGTH, int(prediction_days))
+    
+    if scaler is None:
+        return list(future_predictions)
+    # Desnormalizar predicciones
+    return [scaler.inverse_transform(row.reshape(-1, 1)).ravel() for row in future_predictions]
 
-    
\ No newline at end of file
+def forecast_intervals(trained, frames, prediction_days, samples):
+    """Percentiles de samples trayectorias de Monte Carlo dropout por histórico: lista de {'p5': [...], ...}"""
+    from src.services import forecasting
+    scaler = trained.scaler
+    series = [frame['Close'].values.reshape(-1, 1) for frame in frames]
+    if scaler is not None:
+        series = [scaler.transform(values) for values in series]
+    
+    # Todas las trayectorias de todas las series en una sola ejecución del grafo
+    paths = forecasting.sample_batch(trained, series, SEQUENCE_LENGTH, int(prediction_days), samples)
+    bands = np.percentile(paths, INTERVAL_PERCENTILES, axis=1)
+    
+    intervals = []
+    for i in range(len(frames)):
+        percentiles = {}
+        for percentile, band in zip(INTERVAL_PERCENTILES, bands):
+            values = band[i]
+            # Desnormalizar: la transformación es monótona, así que conserva los percentiles
+            if scaler is not None:
+                values = scaler.inverse_transform(values.reshape(-1, 1)).ravel()
+            percentiles[f'p{percentile}'] = [float(price) for price in values]
+        intervals.append(percentiles)
+    return intervals
+
+def build_light_prediction(model_name, symbol, company_name, training_period, prediction_days, hist_data):
+    """Generar la predicción con un modelo ligero ajustado en el momento"""
+    future_prices, metrics = light_forecasting.run_engine(model_name, hist_data['Close'].values, int(prediction_days))
+    return build_result(
+        symbol, company_name, training_period, prediction_days, hist_data,
+        future_prices, metrics, model_name, datetime.now().isoformat()
+    )
+
+def build_result(symbol, company_name, training_period, prediction_days, hist_data, future_prices, metrics, model_name, trained_at,
+                 intervals=None):
+    """Respuesta común a todos los modelos de predicción"""
+    accuracy = metrics['accuracy']
+    
+    # Preparar datos para respuesta
+    current_price = float(hist_data['Close'].iloc[-1])
+    predicted_price = float(future_prices[-1])
+    
+    # Generar fechas para predicciones
+    last_date = hist_data.index[-1]
+    prediction_dates = [last_date + timedelta(days=i+1) for i in range(prediction_days)]
+    
+    # Calcular confianza del modelo
+    model_confidence = max(0.5, min(0.95, accuracy))
+    
+    # Generar recomendación
+    price_change_percent = (predicted_price - current_price) / current_price * 100
+    if price_change_percent > 5:
+        recommendation = "Considerar comprar o mantener posiciones existentes"
+    elif price_change_percent < -5:
+        recommendation = "Considerar vender o evitar nuevas posiciones"
+    else:
+        recommendation = "Mantener posiciones actuales, tendencia neutral"
+    
+    result = {
+        'symbol': symbol,
+        'company_name': company_name,
+        'current_price': current_price,
+        'predicted_price': predicted_price,
+        'prediction_days': prediction_days,
+        'training_period': training_period,
+        'model_confidence': model_confidence,
+        'recommendation': recommendation,
+        'model': model_name,
+        'model_metrics': metrics,
+        'model_trained_at': trained_at,
+        'historical_dates': [date.strftime('%Y-%m-%d') for date in hist_data.index[-100:]],
+        'historical_prices': hist_data['Close'].iloc[-100:].tolist(),
+        'prediction_dates': [date.strftime('%Y-%m-%d') for date in prediction_dates],
+        'predicted_prices': [float(price) for price in future_prices],
+        'analysis_date': datetime.now().isoformat(),
+        'stale': market_data.is_stale(hist_data)
+    }
+    if intervals is not None:
+        result['prediction_intervals'] = intervals
+    
+    return result
@@ -1,8 +1,8 @@
 from flask import Blueprint, request, jsonify, session
-import yfinance as yf
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from src.services import market_data
 
 recomendaciones_bp = Blueprint('recomendaciones', __name__)
 
@@ -199,12 +199,11 @@ def api_generate_recommendation():
             return jsonify({'success': False, 'message': 'Símbolo requerido'})
         
         # Obtener datos de la empresa
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        info = market_data.get_info(symbol)
         company_name = info.get('longName', symbol)
         
         # Obtener datos históricos
-        hist_data = ticker.history(period="1y")
+        hist_data = market_data.get_history(symbol, period="1y")
         
         if hist_data.empty:
             return jsonify({'success': False, 'message': 'No se pudieron obtener datos históricos'})
@@ -228,7 +227,8 @@ def api_generate_recommendation():
             'timeframe': timeframe,
             'recommendation': recommendation,
             'indicators': indicators,
-            'analysis_date': datetime.now().isoformat()
+            'analysis_date': datetime.now().isoformat(),
+            'stale': market_data.is_stale(hist_data)
         }
         
         return jsonify({'success': True, 'data': result})
@@ -0,0 +1,59 @@
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: se rechaza la llamada sin contactar al proveedor"""
+
+
+class CircuitBreaker:
+    """Corta las llamadas a un servicio tras varios fallos seguidos.
+
+    Tras failure_threshold fallos consecutivos el circuito se abre y las llamadas
+    fallan de inmediato durante reset_timeout segundos. Después se deja pasar una
+    única llamada de prueba: si funciona se cierra, si falla se vuelve a abrir.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+    def call(self, fn, *args, **kwargs):
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._record_failure()
+            raise
+        self._record_success()
+        return result
+
+    def _before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError('Proveedor de datos no disponible temporalmente')
+            self._trial_running = True
+
+    def _record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def _record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
@@ -0,0 +1,428 @@
+import os
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.metrics import mean_squared_error
+import tensorflow as tf
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.layers import LSTM, Dense, Dropout
+from tensorflow.keras.callbacks import Callback, EarlyStopping
+from tensorflow.keras.utils import PyDataset
+from src.services.model_registry import MODEL_DIR, ModelRegistry, TrainedModel, global_model_key
+
+# Épocas máximas; el entrenamiento se corta antes si deja de mejorar o se agota el tiempo
+MAX_EPOCHS = int(os.environ.get('PREDICTION_MAX_EPOCHS', 50))
+EARLY_STOPPING_PATIENCE = int(os.environ.get('PREDICTION_EARLY_STOPPING_PATIENCE', 10))
+# Segundos máximos de entrenamiento por modelo
+TRAINING_BUDGET = float(os.environ.get('PREDICTION_TRAINING_BUDGET', 60))
+
+# Segundos máximos para entrenar el modelo global (fuera de línea)
+GLOBAL_TRAINING_BUDGET = float(os.environ.get('PREDICTION_GLOBAL_TRAINING_BUDGET', 1800))
+
+# Reajuste incremental (warm start) cuando llegan barras nuevas
+FINE_TUNE_EPOCHS = int(os.environ.get('PREDICTION_FINE_TUNE_EPOCHS', 5))
+# Ventanas más recientes con las que se reajusta, incluidas las nuevas
+FINE_TUNE_SAMPLES = int(os.environ.get('PREDICTION_FINE_TUNE_SAMPLES', 128))
+# Con más barras nuevas que estas se entrena desde cero
+FINE_TUNE_MAX_NEW_BARS = int(os.environ.get('PREDICTION_FINE_TUNE_MAX_NEW_BARS', 20))
+# Margen fuera de [0, 1] que se tolera al normalizar con el escalador guardado
+SCALER_DRIFT_TOLERANCE = float(os.environ.get('PREDICTION_SCALER_DRIFT_TOLERANCE', 0.1))
+# Si el RMSE en las barras nuevas supera el del modelo por este factor, se reentrena
+FINE_TUNE_MAX_ERROR_RATIO = float(os.environ.get('PREDICTION_FINE_TUNE_MAX_ERROR_RATIO', 1.5))
+
+
+def create_sequences(data, sequence_length, target_column=0):
+    """Crear secuencias para entrenamiento LSTM.
+
+    data es (n,) o (n, n_features). Devuelve X con forma
+    (n - sequence_length, sequence_length, n_features) como vista sobre data,
+    sin copiar las ventanas, e y con el valor de target_column que sigue a
+    cada ventana.
+    """
+    data = np.asarray(data)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    if len(data) <= sequence_length:
+        return np.empty((0, sequence_length, data.shape[1]), dtype=data.dtype), np.empty(0, dtype=data.dtype)
+    # sliding_window_view deja la ventana en el último eje: (n, features, ventana)
+    X = sliding_window_view(data[:-1], sequence_length, axis=0).transpose(0, 2, 1)
+    y = data[sequence_length:, target_column]
+    return X, y
+
+
+class SequenceBatches(PyDataset):
+    """Lotes de ventanas para model.fit/predict que se copian solo al pedirlos.
+
+    indices selecciona las ventanas (por ejemplo, solo las de entrenamiento);
+    con shuffle=True se barajan en cada época como haría fit con arrays.
+    """
+
+    def __init__(self, X, y, indices=None, batch_size=32, shuffle=False, **kwargs):
+        super().__init__(**kwargs)
+        self.X = X
+        self.y = y
+        self.indices = np.arange(len(X)) if indices is None else np.asarray(indices)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        if shuffle:
+            np.random.shuffle(self.indices)
+
+    def __len__(self):
+        return int(np.ceil(len(self.indices) / self.batch_size))
+
+    def __getitem__(self, index):
+        batch = self.indices[index * self.batch_size:(index + 1) * self.batch_size]
+        return self.X[batch], self.y[batch]
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            np.random.shuffle(self.indices)
+
+
+class RelativeBatches(SequenceBatches):
+    """Lotes normalizados respecto al último precio de cada ventana.
+
+    Así las ventanas de símbolos con precios muy distintos son comparables y
+    un mismo modelo sirve para todos; el objetivo es el rendimiento relativo.
+    """
+
+    def __getitem__(self, index):
+        X, y = super().__getitem__(index)
+        anchors = X[:, -1:, :]
+        return X / anchors - 1, y / anchors[:, 0, 0] - 1
+
+
+def stack_series(series_list, sequence_length):
+    """Ventanas de varias series sin mezclar símbolos: (X, y, índices válidos de cada serie)"""
+    data = np.concatenate([np.asarray(series, dtype=np.float32).ravel() for series in series_list])
+    X, y = create_sequences(data, sequence_length)
+    indices, start = [], 0
+    for series in series_list:
+        end = start + len(series)
+        # X[i] = data[i:i+L] e y[i] = data[i+L] deben caer dentro de la misma serie
+        indices.append(np.arange(start, max(start, end - sequence_length)))
+        start = end
+    return X, y, indices
+
+
+def split_windows(indices):
+    """Dividir las ventanas de cada serie en entrenamiento, validación y prueba respetando el orden temporal"""
+    train, validation, test = [], [], []
+    for windows in indices:
+        train_size = int(len(windows) * 0.8)
+        fit_size = int(np.ceil(train_size * 0.9))
+        train.append(windows[:fit_size])
+        validation.append(windows[fit_size:train_size])
+        test.append(windows[train_size:])
+    return np.concatenate(train), np.concatenate(validation), np.concatenate(test)
+
+
+class TimeBudget(Callback):
+    """Detiene el entrenamiento cuando se agota el tiempo asignado"""
+
+    def __init__(self, seconds):
+        super().__init__()
+        self.seconds = seconds
+        self.started_at = None
+
+    def on_train_begin(self, logs=None):
+        self.started_at = time.monotonic()
+
+    def on_train_batch_end(self, batch, logs=None):
+        if time.monotonic() - self.started_at > self.seconds:
+            self.model.stop_training = True
+
+
+def fit_with_budget(model, train_batches, validation_batches=None, epochs=MAX_EPOCHS, time_budget=TRAINING_BUDGET):
+    """Entrenar con parada temprana sobre val_loss y límite de tiempo; devuelve épocas y segundos"""
+    callbacks = [TimeBudget(time_budget)]
+    if validation_batches is not None and len(validation_batches):
+        callbacks.append(EarlyStopping(monitor='val_loss', patience=EARLY_STOPPING_PATIENCE, restore_best_weights=True))
+    else:
+        validation_batches = None
+
+    started_at = time.monotonic()
+    history = model.fit(train_batches, validation_data=validation_batches, epochs=epochs, callbacks=callbacks, verbose=0)
+    return len(history.history['loss']), time.monotonic() - started_at
+
+
+def create_lstm_model(input_shape):
+    """Crear modelo LSTM"""
+    model = Sequential([
+        LSTM(50, return_sequences=True, input_shape=input_shape),
+        Dropout(0.2),
+        LSTM(50, return_sequences=True),
+        Dropout(0.2),
+        LSTM(50),
+        Dropout(0.2),
+        Dense(1)
+    ])
+
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+def train_lstm_model(prices, sequence_length, target_column=0, batch_size=32, time_budget=TRAINING_BUDGET):
+    """Entrenar un modelo LSTM sobre los precios de cierre y calcular sus métricas.
+
+    prices puede tener varias columnas (características); se predice target_column.
+    """
+    # Normalizar datos
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaled_data = scaler.fit_transform(prices).astype(np.float32)
+
+    # Crear secuencias y dividir en entrenamiento, validación y prueba
+    X, y = create_sequences(scaled_data, sequence_length, target_column)
+    train_size = int(len(X) * 0.8)
+    # Igual que validation_split=0.1: el último 10% del tramo de entrenamiento
+    fit_size = int(np.ceil(train_size * 0.9))
+    train_batches = SequenceBatches(X, y, np.arange(fit_size), batch_size, shuffle=True)
+    validation_batches = SequenceBatches(X, y, np.arange(fit_size, train_size), batch_size)
+
+    model = create_lstm_model((sequence_length, scaled_data.shape[1]))
+    epochs, training_time = fit_with_budget(model, train_batches, validation_batches, time_budget=time_budget)
+
+    metrics = evaluate_model(model, scaler, X, y, np.arange(train_size, len(X)), target_column, batch_size)
+    metrics.update(epochs=epochs, training_time=round(training_time, 2))
+    return TrainedModel(model, scaler, metrics)
+
+
+def fine_tune_lstm_model(previous, prices, sequence_length, new_bars, target_column=0, batch_size=32,
+                         time_budget=TRAINING_BUDGET):
+    """Reajustar un modelo guardado con las barras nuevas, o None si hay que entrenar desde cero.
+
+    Reutiliza el escalador del modelo anterior. Se descarta el reajuste si hay
+    demasiadas barras nuevas, si los precios se salen del rango del escalador
+    o si el error del modelo en las barras nuevas se ha degradado. Las ventanas
+    recientes con las que se reajusta incluyen las de prueba, así que se
+    conservan las métricas fuera de muestra del modelo anterior.
+    """
+    if new_bars <= 0 or new_bars > FINE_TUNE_MAX_NEW_BARS:
+        return None
+
+    scaler = previous.scaler
+    scaled_data = scaler.transform(prices).astype(np.float32)
+    if scaled_data.min() < -SCALER_DRIFT_TOLERANCE or scaled_data.max() > 1 + SCALER_DRIFT_TOLERANCE:
+        return None
+
+    X, y = create_sequences(scaled_data, sequence_length, target_column)
+    if len(X) < new_bars:
+        return None
+
+    # Error del modelo anterior en las barras que no ha visto
+    model = previous.model
+    new_windows = np.arange(len(X) - new_bars, len(X))
+    new_metrics = evaluate_model(model, scaler, X, y, new_windows, target_column, batch_size)
+    if new_metrics['rmse'] > previous.metrics['rmse'] * FINE_TUNE_MAX_ERROR_RATIO:
+        return None
+
+    recent_windows = np.arange(max(0, len(X) - FINE_TUNE_SAMPLES), len(X))
+    epochs, training_time = fit_with_budget(
+        model, SequenceBatches(X, y, recent_windows, batch_size, shuffle=True),
+        epochs=FINE_TUNE_EPOCHS, time_budget=time_budget
+    )
+
+    # Métricas del último entrenamiento completo y error en las barras nuevas antes del reajuste
+    metrics = {name: previous.metrics[name] for name in ('mse', 'rmse', 'accuracy')}
+    metrics.update(new_bars_rmse=new_metrics['rmse'], epochs=epochs, training_time=round(training_time, 2))
+    return TrainedModel(model, scaler, metrics, warm_start_from=previous.trained_at)
+
+
+def evaluate_model(model, scaler, X, y, test_windows, target_column=0, batch_size=32):
+    """Métricas del modelo sobre las ventanas de prueba"""
+    test_predictions = model.predict(SequenceBatches(X, y, test_windows, batch_size), verbose=0).ravel()
+    y_test = y[test_windows]
+    test_mse = mean_squared_error(y_test, test_predictions)
+    rmse = np.sqrt(test_mse)
+
+    # Calcular precisión (porcentaje de predicciones dentro del 5% del valor real)
+    test_predictions_scaled = inverse_target(scaler, test_predictions, target_column)
+    y_test_scaled = inverse_target(scaler, y_test, target_column)
+    accuracy = np.mean(np.abs((test_predictions_scaled - y_test_scaled) / y_test_scaled) < 0.05)
+
+    return {
+        'mse': float(test_mse),
+        'rmse': float(rmse),
+        'accuracy': float(accuracy)
+    }
+
+
+def inverse_target(scaler, values, target_column=0):
+    """Deshacer la normalización de una sola columna del MinMaxScaler"""
+    return (np.asarray(values) - scaler.min_[target_column]) / scaler.scale_[target_column]
+
+
+def train_global_model(series_list, sequence_length, batch_size=256, time_budget=GLOBAL_TRAINING_BUDGET):
+    """Entrenar un único modelo con las ventanas normalizadas de muchos símbolos"""
+    X, y, indices = stack_series(series_list, sequence_length)
+    train_windows, validation_windows, test_windows = split_windows(indices)
+
+    model = create_lstm_model((sequence_length, 1))
+    epochs, training_time = fit_with_budget(
+        model,
+        RelativeBatches(X, y, train_windows, batch_size, shuffle=True),
+        RelativeBatches(X, y, validation_windows, batch_size),
+        time_budget=time_budget
+    )
+
+    metrics = evaluate_relative_model(model, X, y, test_windows, batch_size)
+    metrics.update(epochs=epochs, training_time=round(training_time, 2), symbols=len(series_list))
+    return TrainedModel(model, None, metrics)
+
+
+def fine_tune_global_model(global_trained, prices, sequence_length, batch_size=32, time_budget=TRAINING_BUDGET):
+    """Reajustar el modelo global con el histórico de un símbolo"""
+    X, y, indices = stack_series([prices], sequence_length)
+    train_windows, validation_windows, test_windows = split_windows(indices)
+
+    model = global_trained.model
+    epochs, training_time = fit_with_budget(
+        model,
+        RelativeBatches(X, y, train_windows, batch_size, shuffle=True),
+        RelativeBatches(X, y, validation_windows, batch_size),
+        epochs=FINE_TUNE_EPOCHS,
+        time_budget=time_budget
+    )
+
+    metrics = evaluate_relative_model(model, X, y, test_windows, batch_size)
+    metrics.update(epochs=epochs, training_time=round(training_time, 2))
+    return TrainedModel(model, None, metrics, warm_start_from=global_trained.trained_at)
+
+
+def evaluate_relative_model(model, X, y, test_windows, batch_size=32):
+    """Métricas de un modelo de ventanas relativas sobre las ventanas de prueba"""
+    test_predictions = model.predict(RelativeBatches(X, y, test_windows, batch_size), verbose=0).ravel()
+    anchors = X[test_windows, -1, 0]
+    y_test = y[test_windows] / anchors - 1
+    test_mse = mean_squared_error(y_test, test_predictions)
+
+    # Precisión: predicciones dentro del 5% del precio real
+    accuracy = np.mean(np.abs(test_predictions - y_test) / (1 + y_test) < 0.05)
+
+    return {
+        'mse': float(test_mse),
+        'rmse': float(np.sqrt(test_mse)),
+        'accuracy': float(accuracy)
+    }
+
+
+def make_forecaster(model, relative=False, sample=False):
+    """Compilar la predicción recursiva en un único grafo.
+
+    Cada paso alimenta la ventana con la predicción anterior, igual que el
+    bucle con model.predict, pero todos los pasos se ejecutan en una sola
+    llamada a TensorFlow. Las ventanas de varias series se apilan en el eje
+    del lote, de modo que cada paso es una sola invocación del modelo. Con
+    relative=True las ventanas son precios sin normalizar y cada paso se
+    normaliza respecto al último precio, como en RelativeBatches. Con
+    sample=True los Dropout siguen activos (Monte Carlo dropout) y cada fila
+    del lote es una trayectoria aleatoria.
+    """
+    @tf.function(input_signature=[
+        tf.TensorSpec(shape=[None, None, 1], dtype=tf.float32),
+        tf.TensorSpec(shape=[], dtype=tf.int32)
+    ])
+    def forecast(windows, steps):
+        predictions = tf.TensorArray(tf.float32, size=steps)
+        for i in tf.range(steps):
+            if relative:
+                anchors = windows[:, -1, :]
+                next_values = anchors * (1 + model(windows / windows[:, -1:, :] - 1, training=sample))
+            else:
+                next_values = model(windows, training=sample)
+            predictions = predictions.write(i, next_values[:, 0])
+            # Desplazar las ventanas: quitar el valor más antiguo y añadir la predicción
+            windows = tf.concat([windows[:, 1:, :], tf.reshape(next_values, [-1, 1, 1])], axis=1)
+        # (pasos, series) -> (series, pasos)
+        return tf.transpose(predictions.stack())
+    return forecast
+
+
+def last_windows(scaled_series, sequence_length):
+    """Últimas sequence_length observaciones de cada serie apiladas en el eje del lote"""
+    return np.stack([
+        np.asarray(series[-sequence_length:], dtype=np.float32).reshape(sequence_length, 1)
+        for series in scaled_series
+    ])
+
+
+def forecast_batch(trained, scaled_series, sequence_length, steps):
+    """Predecir steps valores para cada serie a partir de sus últimas sequence_length observaciones.
+
+    Las series van normalizadas con el escalador del modelo, o en precios si
+    el modelo no tiene escalador (ventanas relativas).
+    """
+    if trained.forecaster is None:
+        trained.forecaster = make_forecaster(trained.model, relative=trained.scaler is None)
+    windows = last_windows(scaled_series, sequence_length)
+    return trained.forecaster(tf.constant(windows), tf.constant(steps, dtype=tf.int32)).numpy()
+
+
+def sample_batch(trained, scaled_series, sequence_length, steps, samples):
+    """Trayectorias de Monte Carlo dropout: array (series, samples, steps).
+
+    Las samples copias de cada ventana se apilan en el eje del lote, así que
+    todas las pasadas estocásticas se ejecutan en la misma llamada al grafo.
+    """
+    if trained.sampler is None:
+        trained.sampler = make_forecaster(trained.model, relative=trained.scaler is None, sample=True)
+    windows = np.repeat(last_windows(scaled_series, sequence_length), samples, axis=0)
+    paths = trained.sampler(tf.constant(windows), tf.constant(steps, dtype=tf.int32)).numpy()
+    return paths.reshape(len(scaled_series), samples, steps)
+
+
+def train_and_store(model_dir, key, prices, sequence_length, previous_key=None, new_bars=0,
+                    time_budget=TRAINING_BUDGET):
+    """Trabajo de entrenamiento: se ejecuta en un proceso aparte y deja el modelo en el registro.
+
+    Con previous_key se intenta reajustar esa versión con las new_bars barras
+    nuevas antes de recurrir a un entrenamiento completo.
+    """
+    registry = ModelRegistry(model_dir)
+    trained = None
+    if previous_key is not None:
+        previous = registry.load(previous_key)
+        if previous is not None:
+            trained = fine_tune_lstm_model(previous, prices, sequence_length, new_bars, time_budget=time_budget)
+    if trained is None:
+        trained = train_lstm_model(prices, sequence_length, time_budget=time_budget)
+    registry.save(key, trained)
+    return trained.metrics
+
+
+def fine_tune_global_and_store(model_dir, key, global_key, prices, sequence_length, time_budget=TRAINING_BUDGET):
+    """Trabajo de entrenamiento: reajusta el modelo global para un símbolo y lo guarda en el registro"""
+    registry = ModelRegistry(model_dir)
+    global_trained = registry.load(global_key)
+    if global_trained is None:
+        raise RuntimeError('Modelo global no disponible')
+    trained = fine_tune_global_model(global_trained, prices, sequence_length, time_budget=time_budget)
+    registry.save(key, trained)
+    return trained.metrics
+
+
+if __name__ == '__main__':
+    # Entrenamiento fuera de línea del modelo global:
+    #   python -m src.services.forecasting AAPL MSFT GOOGL ... --period 5y
+    import argparse
+    from src.services import market_data
+
+    parser = argparse.ArgumentParser(description='Entrenar el modelo global de predicción con varios símbolos')
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--sequence-length', type=int, default=60)
+    parser.add_argument('--budget', type=float, default=GLOBAL_TRAINING_BUDGET)
+    args = parser.parse_args()
+
+    frames, errors = market_data.get_histories(args.symbols, period=args.period, priority=market_data.PRIORITY_BACKGROUND)
+    for symbol, message in errors.items():
+        print(f'{symbol}: {message}')
+    frames = {symbol: frame for symbol, frame in frames.items() if len(frame) > args.sequence_length * 2}
+    if not frames:
+        raise SystemExit('No hay datos suficientes para entrenar')
+
+    trained = train_global_model([frame['Close'].values for frame in frames.values()], args.sequence_length, time_budget=args.budget)
+    last_bar = max(frame.index[-1] for frame in frames.values())
+    ModelRegistry(MODEL_DIR).save(global_model_key(args.sequence_length, last_bar), trained)
+    print(f'Modelo global entrenado con {len(frames)} símbolos: {trained.metrics}')
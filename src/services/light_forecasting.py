@@ -0,0 +1,145 @@
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Rendimientos pasados que usan los modelos de retardos
+LAGS = 10
+
+
+class LagRegressionEngine:
+    """Predice el siguiente rendimiento logarítmico a partir de los últimos `lags`.
+
+    Trabajar con rendimientos en lugar de precios permite que los árboles
+    extrapolen fuera del rango visto en el entrenamiento.
+    """
+
+    def __init__(self, estimator, lags=LAGS):
+        self.estimator = estimator
+        self.lags = lags
+
+    def fit(self, prices):
+        returns = np.diff(np.log(prices))
+        # La fila j contiene returns[j:j+lags] y su objetivo es returns[j+lags]
+        X = sliding_window_view(returns[:-1], self.lags)
+        self.estimator.fit(X, returns[self.lags:])
+        return self
+
+    def backtest(self, prices, start):
+        """Predicciones a un paso para prices[start:] usando solo los datos anteriores a cada día"""
+        returns = np.diff(np.log(prices))
+        X = sliding_window_view(returns[:-1], self.lags)[start - self.lags - 1:]
+        return prices[start - 1:-1] * np.exp(self.estimator.predict(X))
+
+    def forecast(self, prices, steps):
+        window = np.diff(np.log(prices))[-self.lags:].copy()
+        log_price = np.log(prices[-1])
+        predictions = np.empty(steps)
+        for i in range(steps):
+            next_return = self.estimator.predict(window.reshape(1, -1))[0]
+            log_price += next_return
+            predictions[i] = log_price
+            window = np.roll(window, -1)
+            window[-1] = next_return
+        return np.exp(predictions)
+
+
+class ExponentialSmoothingEngine:
+    """Suavizado exponencial de Holt con tendencia amortiguada sobre el logaritmo del precio.
+
+    alpha y beta se eligen en una rejilla pequeña minimizando el error a un paso.
+    """
+
+    ALPHAS = (0.1, 0.3, 0.5, 0.7, 0.9)
+    BETAS = (0.01, 0.05, 0.1, 0.2)
+
+    def __init__(self, damping=0.98):
+        self.damping = damping
+        self.alpha = None
+        self.beta = None
+
+    def _smooth(self, series, alpha, beta):
+        """Predicciones a un paso de cada valor de la serie, y el nivel y la tendencia finales"""
+        level, trend = series[0], series[1] - series[0]
+        predictions = np.empty(len(series))
+        predictions[0] = series[0]
+        for t in range(1, len(series)):
+            predictions[t] = level + self.damping * trend
+            previous_level = level
+            level = alpha * series[t] + (1 - alpha) * predictions[t]
+            trend = beta * (level - previous_level) + (1 - beta) * self.damping * trend
+        return predictions, level, trend
+
+    def fit(self, prices):
+        series = np.log(prices)
+        best_error = None
+        for alpha in self.ALPHAS:
+            for beta in self.BETAS:
+                predictions, _, _ = self._smooth(series, alpha, beta)
+                error = np.mean((predictions[2:] - series[2:]) ** 2)
+                if best_error is None or error < best_error:
+                    best_error, self.alpha, self.beta = error, alpha, beta
+        return self
+
+    def backtest(self, prices, start):
+        predictions, _, _ = self._smooth(np.log(prices), self.alpha, self.beta)
+        return np.exp(predictions[start:])
+
+    def forecast(self, prices, steps):
+        _, level, trend = self._smooth(np.log(prices), self.alpha, self.beta)
+        # Con tendencia amortiguada el paso h suma trend * (phi + phi^2 + ... + phi^h)
+        damping = np.cumsum(self.damping ** np.arange(1, steps + 1))
+        return np.exp(level + damping * trend)
+
+
+# scikit-learn se importa al crear el modelo para no cargarlo al arrancar la aplicación
+def linear_engine():
+    from sklearn.linear_model import Ridge
+    return LagRegressionEngine(Ridge(alpha=1e-4))
+
+
+def gbm_engine():
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    return LagRegressionEngine(HistGradientBoostingRegressor(max_iter=100, max_depth=3))
+
+
+ENGINES = {
+    'linear': linear_engine,
+    'ets': ExponentialSmoothingEngine,
+    'gbm': gbm_engine,
+}
+
+
+def min_history(name):
+    """Número mínimo de precios para entrenar y evaluar el modelo"""
+    return (LAGS + 2) * 5 if name in ('linear', 'gbm') else 10
+
+
+def run_engine(name, prices, steps):
+    """Evaluar el modelo en el último 20% de la serie y predecir steps días.
+
+    Las métricas siguen el mismo criterio que el LSTM: errores sobre precios
+    normalizados en [0, 1] y precisión como porcentaje de predicciones a un
+    paso dentro del 5% del precio real.
+    """
+    if name not in ENGINES:
+        raise ValueError(f'Modelo no soportado: {name}')
+    prices = np.asarray(prices, dtype=float).ravel()
+    train_size = int(len(prices) * 0.8)
+
+    # Evaluación con los datos que el modelo no ha visto
+    test_predictions = ENGINES[name]().fit(prices[:train_size]).backtest(prices, train_size)
+    actual = prices[train_size:]
+    price_range = prices.max() - prices.min() or 1.0
+    mse = np.mean(((test_predictions - actual) / price_range) ** 2)
+    accuracy = np.mean(np.abs((test_predictions - actual) / actual) < 0.05)
+    metrics = {
+        'mse': float(mse),
+        'rmse': float(np.sqrt(mse)),
+        'accuracy': float(accuracy)
+    }
+
+    # Predicción con el modelo ajustado a toda la serie
+    started_at = time.monotonic()
+    engine = ENGINES[name]().fit(prices)
+    metrics['training_time'] = round(time.monotonic() - started_at, 4)
+    return engine.forecast(prices, steps), metrics
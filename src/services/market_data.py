@@ -0,0 +1,575 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from src.services.cache import TTLCache
+from src.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.services.price_store import PriceStore, covers_period, listed_within_period, merge_bars, slice_period
+from src.services.providers import create_provider
+from src.services.rate_limiter import (PRIORITY_BACKGROUND, PRIORITY_DASHBOARD, PRIORITY_INTERACTIVE,
+                                       PriorityRateLimiter, RateLimitExceeded)
+from src.services.singleflight import SingleFlight
+
+# Configuración de la caché (se puede ajustar con variables de entorno)
+HISTORY_CACHE_SIZE = int(os.environ.get('MARKET_DATA_HISTORY_CACHE_SIZE', 512))
+HISTORY_TTL = int(os.environ.get('MARKET_DATA_HISTORY_TTL', 300))
+INTRADAY_HISTORY_TTL = int(os.environ.get('MARKET_DATA_INTRADAY_TTL', 60))
+FETCH_WORKERS = int(os.environ.get('MARKET_DATA_FETCH_WORKERS', 16))
+BACKGROUND_FETCH_WORKERS = int(os.environ.get('MARKET_DATA_BACKGROUND_FETCH_WORKERS', 4))
+
+# Plazos y protección frente a un proveedor lento o caído
+UPSTREAM_TIMEOUT = float(os.environ.get('MARKET_DATA_UPSTREAM_TIMEOUT', 8))
+UPSTREAM_WORKERS = int(os.environ.get('MARKET_DATA_UPSTREAM_WORKERS', 32))
+STALE_TTL = int(os.environ.get('MARKET_DATA_STALE_TTL', 24 * 3600))
+BREAKER_THRESHOLD = int(os.environ.get('MARKET_DATA_BREAKER_THRESHOLD', 5))
+BREAKER_RESET = int(os.environ.get('MARKET_DATA_BREAKER_RESET', 30))
+
+# Límite de llamadas salientes (tokens por segundo y ráfaga máxima; 0 lo desactiva)
+RATE_LIMIT = float(os.environ.get('MARKET_DATA_RATE_LIMIT', 5))
+RATE_LIMIT_BURST = int(os.environ.get('MARKET_DATA_RATE_LIMIT_BURST', 10))
+# Espera máxima en cola según la prioridad, en segundos
+RATE_LIMIT_MAX_WAIT = {
+    PRIORITY_INTERACTIVE: 4,
+    PRIORITY_DASHBOARD: 8,
+    PRIORITY_BACKGROUND: 30
+}
+
+# Los metadatos (nombre, fundamentales) cambian poco: TTL en horas
+INFO_CACHE_SIZE = int(os.environ.get('MARKET_DATA_INFO_CACHE_SIZE', 1024))
+INFO_TTL = int(os.environ.get('MARKET_DATA_INFO_TTL', 6 * 3600))
+
+# Proveedor de datos: 'yfinance' o 'replay' (fixtures locales para benchmarks)
+PROVIDER = os.environ.get('MARKET_DATA_PROVIDER', 'yfinance')
+REPLAY_DIR = os.environ.get('MARKET_DATA_REPLAY_DIR')
+REPLAY_LATENCY = float(os.environ.get('MARKET_DATA_REPLAY_LATENCY', 0))
+
+# Almacén local de precios diarios; solo se usa con el proveedor real (yfinance)
+STORE_ENABLED = os.environ.get('MARKET_DATA_STORE_ENABLED', '1') == '1'
+STORE_DIR = os.environ.get(
+    'MARKET_DATA_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'prices')
+)
+STORED_INTERVALS = {'1d'}
+
+# Refresco en segundo plano de las claves consultadas recientemente
+REFRESH_ENABLED = os.environ.get('MARKET_DATA_REFRESH_ENABLED', '1') == '1'
+REFRESH_INTERVAL = int(os.environ.get('MARKET_DATA_REFRESH_INTERVAL', 15))
+REFRESH_AHEAD = int(os.environ.get('MARKET_DATA_REFRESH_AHEAD', 30))
+HOT_WINDOW = int(os.environ.get('MARKET_DATA_HOT_WINDOW', 900))
+HOT_KEYS_SIZE = int(os.environ.get('MARKET_DATA_HOT_KEYS_SIZE', 256))
+# Entradas refrescadas como máximo en cada pasada; el resto espera a la siguiente
+REFRESH_BATCH = int(os.environ.get('MARKET_DATA_REFRESH_BATCH', 8))
+
+INTRADAY_INTERVALS = {'1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h'}
+
+
+def _create_price_store(provider):
+    """Almacén de precios para el proveedor, o None.
+
+    Con otros proveedores (fixtures de benchmarks) se desactiva para que sus
+    datos no sobrescriban los precios reales guardados ni se lean en su lugar.
+    """
+    if not STORE_ENABLED or getattr(provider, 'name', None) != 'yfinance':
+        return None
+    return PriceStore(STORE_DIR)
+
+
+_history_cache = TTLCache(maxsize=HISTORY_CACHE_SIZE, ttl=HISTORY_TTL, stale_ttl=STALE_TTL)
+_info_cache = TTLCache(maxsize=INFO_CACHE_SIZE, ttl=INFO_TTL, stale_ttl=STALE_TTL)
+_name_cache = TTLCache(maxsize=INFO_CACHE_SIZE, ttl=INFO_TTL, stale_ttl=STALE_TTL)
+_fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='market-data')
+# Las descargas de baja prioridad pueden esperar turno mucho tiempo: no comparten hilos con el resto
+_background_fetch_executor = ThreadPoolExecutor(max_workers=BACKGROUND_FETCH_WORKERS,
+                                                thread_name_prefix='market-data-background')
+# Las llamadas al proveedor corren en su propio pool para poder esperarlas con plazo
+_upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix='market-data-upstream')
+_breaker = CircuitBreaker(failure_threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET)
+_limiter = PriorityRateLimiter(rate=RATE_LIMIT, capacity=RATE_LIMIT_BURST)
+# Prioridad de la descarga que se ejecuta en el hilo actual del pool, y si ya tiene turno
+_call_context = threading.local()
+_provider = create_provider(PROVIDER, replay_dir=REPLAY_DIR, replay_latency=REPLAY_LATENCY)
+_price_store = _create_price_store(_provider)
+# Peticiones idénticas concurrentes comparten una sola descarga
+_inflight = SingleFlight()
+# Claves usadas recientemente (se olvidan tras HOT_WINDOW sin consultas)
+_hot_keys = TTLCache(maxsize=HOT_KEYS_SIZE, ttl=HOT_WINDOW)
+_refresher_thread = None
+_refresher_lock = threading.Lock()
+
+
+class MarketDataUnavailable(Exception):
+    """El proveedor no respondió (plazo agotado o circuito abierto) y no hay copia en caché"""
+
+
+def normalize_symbol(symbol):
+    return (symbol or '').strip().upper()
+
+
+def history_ttl(period, interval):
+    """TTL de la caché según la granularidad de los datos"""
+    if interval in INTRADAY_INTERVALS or period in ('1d', '2d', '5d'):
+        return INTRADAY_HISTORY_TTL
+    return HISTORY_TTL
+
+
+def get_provider():
+    return _provider
+
+
+def set_provider(provider):
+    """Cambiar el proveedor de datos (por ejemplo, un ReplayProvider en benchmarks).
+
+    Vacía las cachés y activa o desactiva el almacén de precios para no
+    mezclar datos de proveedores distintos.
+    """
+    global _provider, _price_store
+    _provider = provider
+    _price_store = _create_price_store(provider)
+    clear_cache()
+
+
+def is_stale(data):
+    """Indica si un histórico se sirvió desde una copia caducada"""
+    return bool(getattr(data, 'attrs', {}).get('stale', False))
+
+
+def _mark_stale(data):
+    stale = data.copy(deep=False)
+    stale.attrs = dict(data.attrs, stale=True)
+    return stale
+
+
+def _upstream(fn, *args, cost=1, **kwargs):
+    """Llamar al proveedor respetando el límite de peticiones y el circuit breaker.
+
+    cost es el número de peticiones reales que implica la llamada (por ejemplo,
+    los símbolos de una descarga por lotes). La primera llamada de cada descarga
+    usa el turno que _fetch ya obtuvo; solo las siguientes (poco habituales)
+    esperan aquí.
+    """
+    if getattr(_call_context, 'prepaid', False):
+        _call_context.prepaid = False
+    else:
+        priority = getattr(_call_context, 'priority', PRIORITY_DASHBOARD)
+        _limiter.acquire(priority, cost=cost, timeout=RATE_LIMIT_MAX_WAIT[priority])
+    return _breaker.call(fn, *args, **kwargs)
+
+
+def _run_with_priority(priority, fn, *args, **kwargs):
+    previous = getattr(_call_context, 'priority', None)
+    _call_context.priority = priority
+    # Quien envía la descarga obtiene el turno del limitador antes de enviarla
+    _call_context.prepaid = True
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _call_context.priority = previous
+        _call_context.prepaid = False
+
+
+def _fetch(key, loader, *args, priority=PRIORITY_DASHBOARD, cost=1, cached=None):
+    """Ejecutar loader una sola vez por clave y esperarlo como máximo UPSTREAM_TIMEOUT.
+
+    La primera petición reserva la clave y espera el turno del limitador en
+    su propio hilo, con su prioridad, antes de enviar la descarga al pool: las
+    peticiones en cola no ocupan hilos del pool y una interactiva nunca queda
+    detrás de las de segundo plano. Las que llegan mientras tanto esperan esa
+    misma descarga sin pedir turno. cached, si se indica, se consulta tras la
+    espera por si otro hilo ya actualizó la caché. Si se agota el plazo la
+    descarga sigue en segundo plano y actualizará la caché.
+    """
+    future, is_leader = _inflight.claim(key)
+    timeout = UPSTREAM_TIMEOUT
+    if is_leader:
+        _start_fetch(future, priority, cost, cached, loader, *args)
+    else:
+        # Quien reservó la clave puede estar aún esperando su turno
+        timeout += RATE_LIMIT_MAX_WAIT[priority]
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError as e:
+        raise MarketDataUnavailable('El proveedor de datos no respondió a tiempo') from e
+    except (CircuitOpenError, RateLimitExceeded) as e:
+        raise MarketDataUnavailable(str(e)) from e
+
+
+def _start_fetch(future, priority, cost, cached, loader, *args):
+    """Obtener turno y enviar la descarga al pool; su resultado completa future"""
+    try:
+        _limiter.acquire(priority, cost=cost, timeout=RATE_LIMIT_MAX_WAIT[priority])
+        data = cached() if cached is not None else None
+        if data is not None:
+            future.set_result(data)
+            return
+        upstream = _upstream_executor.submit(_run_with_priority, priority, loader, *args)
+    except Exception as e:
+        future.set_exception(e)
+        return
+
+    def _done(f):
+        exception = f.exception()
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(f.result())
+
+    upstream.add_done_callback(_done)
+
+
+def get_history(symbol, period='1y', interval='1d', priority=PRIORITY_DASHBOARD):
+    """Obtener datos históricos OHLCV usando la caché compartida.
+
+    El DataFrame devuelto se comparte entre peticiones: no debe modificarse.
+    Si el proveedor falla y hay una copia caducada, se devuelve esa copia
+    marcada como obsoleta (ver is_stale). priority ordena la llamada al
+    proveedor frente a otras cuando se alcanza el límite de peticiones.
+    """
+    symbol = normalize_symbol(symbol)
+    key = (symbol, period, interval)
+
+    data = _history_cache.get(key)
+    if data is None:
+        try:
+            data = _fetch(('history',) + key, _load_history, symbol, period, interval, priority=priority,
+                          cached=lambda: _history_cache.get(key))
+        except Exception:
+            # Otro hilo pudo actualizar la caché mientras esta petición esperaba
+            data = _history_cache.get(key)
+            if data is None:
+                stale = _history_cache.get_stale(key)
+                if stale is None:
+                    raise
+                data = _mark_stale(stale)
+    if not data.empty:
+        _hot_keys.set(('history',) + key, True)
+    return data
+
+
+def _load_history(symbol, period, interval, force=False):
+    key = (symbol, period, interval)
+    # Otro hilo pudo completar la descarga justo antes de entrar aquí
+    data = None if force else _history_cache.get(key)
+    if data is not None:
+        return data
+
+    if _price_store is not None and interval in STORED_INTERVALS:
+        data = _history_from_store(symbol, period, interval)
+    else:
+        data = _upstream(_provider.history, symbol, period=period, interval=interval)
+    # No se guardan respuestas vacías para no fijar errores temporales
+    if not data.empty:
+        _history_cache.set(key, data, ttl=history_ttl(period, interval))
+    return data
+
+
+def _history_from_store(symbol, period, interval):
+    """Servir el histórico desde el almacén local descargando solo las barras nuevas"""
+    with _price_store.lock(symbol, interval):
+        stored = _price_store.load(symbol, interval)
+        if stored is not None and not stored.empty:
+            now = pd.Timestamp.now(tz=stored.index.tz)
+            is_complete = stored.attrs.get('complete', False)
+            if covers_period(stored, period, now, is_complete):
+                data = _append_new_bars(symbol, interval, stored)
+                if data is not None:
+                    return slice_period(data, period, now)
+                # Precios reajustados: lo guardado ya no es comparable
+                stored = None
+
+        # Sin datos suficientes (o con precios reajustados): descarga completa
+        data = _upstream(_provider.history, symbol, period=period, interval=interval)
+        if data.empty:
+            return data
+        now = pd.Timestamp.now(tz=data.index.tz)
+        is_complete = period == 'max' or listed_within_period(data, period, now)
+        if stored is not None and not stored.empty and stored.index.tz == data.index.tz:
+            data = merge_bars(stored, data)
+        data.attrs['complete'] = is_complete
+        _price_store.save(symbol, interval, data)
+        return slice_period(data, period, now)
+
+
+def _append_new_bars(symbol, interval, stored):
+    """Descargar las barras desde la penúltima guardada y añadirlas al almacén.
+
+    La penúltima barra (ya cerrada) se usa para detectar ajustes por splits o
+    dividendos: si su precio cambió, devuelve None para forzar una descarga completa.
+    """
+    overlap_start = stored.index[-2] if len(stored) > 1 else stored.index[-1]
+    new = _upstream(_provider.history, symbol, start=overlap_start.strftime('%Y-%m-%d'), interval=interval)
+    if new.empty:
+        return stored
+
+    if overlap_start in new.index:
+        old_close = stored.loc[overlap_start, 'Close']
+        new_close = new.loc[overlap_start, 'Close']
+        if abs(new_close - old_close) > abs(old_close) * 1e-4:
+            return None
+
+    data = merge_bars(stored, new)
+    data.attrs['complete'] = stored.attrs.get('complete', False)
+    _price_store.save(symbol, interval, data)
+    return data
+
+
+def get_histories(symbols, period='1y', interval='1d', priority=PRIORITY_DASHBOARD):
+    """Obtener el histórico de varios símbolos en paralelo.
+
+    Devuelve (frames, errors): frames es un dict símbolo -> DataFrame en el
+    orden recibido y errors un dict símbolo -> mensaje para los que fallaron.
+    """
+    symbols = [normalize_symbol(s) for s in symbols]
+    symbols = list(dict.fromkeys(s for s in symbols if s))
+
+    # Los símbolos en caché se resuelven sin pasar por el pool
+    results = {}
+    for symbol in symbols:
+        data = _history_cache.get((symbol, period, interval))
+        if data is None:
+            executor = _background_fetch_executor if priority == PRIORITY_BACKGROUND else _fetch_executor
+            data = executor.submit(get_history, symbol, period, interval, priority)
+        results[symbol] = data
+
+    frames, errors = {}, {}
+    for symbol, result in results.items():
+        try:
+            data = result if isinstance(result, pd.DataFrame) else result.result()
+        except Exception as e:
+            errors[symbol] = str(e)
+            continue
+        if data.empty:
+            errors[symbol] = 'Símbolo no encontrado o sin datos'
+        else:
+            frames[symbol] = data
+    return frames, errors
+
+
+def get_histories_batch(symbols, period='2d', interval='1d', refresh=False, priority=PRIORITY_INTERACTIVE):
+    """Obtener el histórico de muchos símbolos con una sola llamada al proveedor.
+
+    Pensado para cotizaciones (pocas barras por símbolo). Devuelve (frames, errors)
+    igual que get_histories y guarda cada símbolo en la caché compartida. Con
+    refresh=True se ignora la caché y se descargan todos los símbolos.
+    """
+    symbols = [normalize_symbol(s) for s in symbols]
+    symbols = list(dict.fromkeys(s for s in symbols if s))
+
+    frames, errors = {}, {}
+    missing = []
+    for symbol in symbols:
+        data = None if refresh else _history_cache.get((symbol, period, interval))
+        if data is not None:
+            frames[symbol] = data
+        else:
+            missing.append(symbol)
+
+    if missing:
+        try:
+            downloaded = _fetch(('batch', tuple(missing), period, interval), _download, missing, period, interval,
+                                priority=priority, cost=len(missing))
+        except Exception as e:
+            downloaded = None
+            for symbol in missing:
+                fresh = _history_cache.get((symbol, period, interval))
+                if fresh is not None:
+                    frames[symbol] = fresh
+                    continue
+                # Sin respuesta del proveedor se recurre a la última copia conocida
+                stale = _history_cache.get_stale((symbol, period, interval))
+                if stale is not None:
+                    frames[symbol] = _mark_stale(stale)
+                else:
+                    errors[symbol] = str(e)
+
+        for symbol in missing:
+            if downloaded is None:
+                break
+            data = downloaded.get(symbol)
+            if data is None or data.empty:
+                errors[symbol] = 'Símbolo no encontrado o sin datos'
+                continue
+            _history_cache.set((symbol, period, interval), data, ttl=history_ttl(period, interval))
+            frames[symbol] = data
+
+    # Mantener el orden recibido
+    frames = {symbol: frames[symbol] for symbol in symbols if symbol in frames}
+    return frames, errors
+
+
+def _download(symbols, period, interval):
+    return _upstream(_provider.histories, symbols, period, interval=interval, cost=len(symbols))
+
+
+def align_closes(frames):
+    """Alinear los precios de cierre de varios símbolos en un índice de fechas común"""
+    closes = {}
+    for symbol, data in frames.items():
+        close = data['Close']
+        # Cada bolsa usa su zona horaria; se alinea por hora local del mercado
+        if close.index.tz is not None:
+            close = close.tz_localize(None)
+        closes[symbol] = close
+
+    if not closes:
+        return pd.DataFrame()
+    return pd.DataFrame(closes).sort_index().ffill().dropna()
+
+
+def get_info(symbol, priority=PRIORITY_DASHBOARD):
+    """Obtener información completa de la empresa (fundamentales), con caché de larga duración"""
+    symbol = normalize_symbol(symbol)
+    info = _info_cache.get(symbol)
+    if info is None:
+        try:
+            info = _fetch(('info', symbol), _load_info, symbol, priority=priority,
+                          cached=lambda: _info_cache.get(symbol))
+        except Exception:
+            # Los fundamentales cambian poco: se usa la copia caducada si existe
+            info = _info_cache.get(symbol)
+            if info is None:
+                info = _info_cache.get_stale(symbol)
+            if info is None:
+                raise
+    if info:
+        _hot_keys.set(('info', symbol), True)
+    return info
+
+
+def _load_info(symbol, force=False):
+    info = None if force else _info_cache.get(symbol)
+    if info is not None:
+        return info
+
+    info = _upstream(_provider.info, symbol)
+    if info:
+        _info_cache.set(symbol, info)
+    return info
+
+
+def get_company_name(symbol, priority=PRIORITY_INTERACTIVE):
+    """Obtener solo el nombre de la empresa sin pedir el info completo.
+
+    Usa los metadatos del gráfico de precios, mucho más ligeros que ticker.info.
+    Si no se puede obtener, devuelve el propio símbolo.
+    """
+    symbol = normalize_symbol(symbol)
+    name = _name_cache.get(symbol)
+    if name is None:
+        info = _info_cache.get(symbol)
+        if info is not None and info.get('longName'):
+            return info['longName']
+        try:
+            name = _fetch(('name', symbol), _load_company_name, symbol, priority=priority,
+                          cached=lambda: _name_cache.get(symbol))
+        except Exception:
+            return _name_cache.get(symbol) or _name_cache.get_stale(symbol, symbol)
+
+    if name != symbol:
+        _hot_keys.set(('name', symbol), True)
+    return name
+
+
+def get_company_names(symbols):
+    """Obtener los nombres de varias empresas en paralelo"""
+    symbols = [normalize_symbol(s) for s in symbols]
+    return dict(zip(symbols, _fetch_executor.map(get_company_name, symbols)))
+
+
+def get_cached_company_names(symbols):
+    """Nombres de empresa ya conocidos, sin llamar al proveedor.
+
+    Los símbolos sin nombre en caché se devuelven tal cual y se marcan como
+    consultados, de modo que el refresco en segundo plano descargue su nombre
+    para las siguientes peticiones.
+    """
+    names = {}
+    for symbol in symbols:
+        symbol = normalize_symbol(symbol)
+        name = _name_cache.get_stale(symbol)
+        if name is None:
+            info = _info_cache.get_stale(symbol)
+            name = info.get('longName') if info else None
+        if name is None:
+            _hot_keys.set(('name', symbol), True)
+        names[symbol] = name or symbol
+    return names
+
+
+def _load_company_name(symbol, force=False):
+    name = None if force else _name_cache.get(symbol)
+    if name is not None:
+        return name
+
+    metadata = _upstream(_provider.metadata, symbol)
+    name = metadata.get('longName') or metadata.get('shortName')
+    if not name:
+        return symbol
+    _name_cache.set(symbol, name)
+    return name
+
+
+def refresh_hot_entries(limit=REFRESH_BATCH):
+    """Recargar en segundo plano las entradas consultadas recientemente que están por expirar.
+
+    En cada pasada se refrescan como mucho limit entradas, empezando por las
+    que expiran antes, y solo mientras el limitador tenga tokens libres.
+    """
+    caches = {'history': _history_cache, 'info': _info_cache, 'name': _name_cache}
+    loaders = {'history': _load_history, 'info': _load_info, 'name': _load_company_name}
+
+    due = []
+    for hot_key in _hot_keys.keys():
+        kind, args = hot_key[0], hot_key[1:]
+        cache_key = args if kind == 'history' else args[0]
+        remaining = caches[kind].expires_in(cache_key)
+        if remaining is not None and remaining > REFRESH_AHEAD:
+            continue
+        # Ya se está descargando (por otra petición o por una pasada anterior)
+        if _inflight.get(hot_key) is not None:
+            continue
+        due.append((remaining or 0, hot_key))
+    due.sort(key=lambda item: item[0])
+
+    for _, hot_key in due[:limit]:
+        kind, args = hot_key[0], hot_key[1:]
+        # Sin turno libre no se espera: la entrada se intenta en la siguiente pasada
+        try:
+            _limiter.acquire(PRIORITY_BACKGROUND, timeout=0)
+        except RateLimitExceeded:
+            break
+        # Misma clave que las peticiones interactivas: si coinciden, comparten la descarga
+        _inflight.submit(hot_key, _upstream_executor, _run_with_priority, PRIORITY_BACKGROUND,
+                         loaders[kind], *args, force=True)
+
+
+def _refresh_loop(interval):
+    while True:
+        time.sleep(interval)
+        # Con el circuito abierto no tiene sentido intentar refrescar
+        if _breaker.is_open:
+            continue
+        try:
+            refresh_hot_entries()
+        except Exception:
+            pass
+
+
+def start_background_refresh(interval=REFRESH_INTERVAL):
+    """Arrancar el hilo que mantiene calientes los símbolos más consultados"""
+    global _refresher_thread
+    if not REFRESH_ENABLED:
+        return
+    with _refresher_lock:
+        if _refresher_thread is not None and _refresher_thread.is_alive():
+            return
+        _refresher_thread = threading.Thread(target=_refresh_loop, args=(interval,),
+                                             name='market-data-refresh', daemon=True)
+        _refresher_thread.start()
+
+
+def clear_cache():
+    _history_cache.clear()
+    _info_cache.clear()
+    _name_cache.clear()
+    _hot_keys.clear()
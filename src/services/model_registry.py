@@ -0,0 +1,147 @@
+import glob
+import json
+import os
+import re
+import threading
+from datetime import datetime
+import joblib
+from src.services.cache import TTLCache
+
+MODEL_DIR = os.environ.get(
+    'PREDICTION_MODEL_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'models')
+)
+# Nombre con el que se guarda el modelo global, entrenado con muchos símbolos
+GLOBAL_MODEL = '__global__'
+
+
+class TrainedModel:
+    """Modelo entrenado junto con el escalador ajustado y sus métricas.
+
+    scaler es None en los modelos que normalizan cada ventana respecto a su
+    último precio (el modelo global y los reajustados a partir de él).
+    """
+
+    def __init__(self, model, scaler, metrics, trained_at=None, warm_start_from=None):
+        self.model = model
+        self.scaler = scaler
+        self.metrics = metrics
+        self.trained_at = trained_at or datetime.now().isoformat()
+        # Fecha de entrenamiento del modelo reajustado, o None si se entrenó desde cero
+        self.warm_start_from = warm_start_from
+        # Predicción recursiva compilada, se crea la primera vez que se usa
+        self.forecaster = None
+        # Igual, pero con Dropout activo para los intervalos de predicción
+        self.sampler = None
+
+
+def model_key(symbol, training_period, sequence_length, last_bar):
+    """Clave de un modelo: cambia cuando cambian los parámetros o llega una barra nueva"""
+    return (symbol, training_period, int(sequence_length), last_bar.strftime('%Y-%m-%d'))
+
+
+def global_model_key(sequence_length, last_bar=None):
+    """Clave del modelo global; sin last_bar solo sirve para buscar la última versión"""
+    return (GLOBAL_MODEL, 'global', int(sequence_length), last_bar.strftime('%Y-%m-%d') if last_bar is not None else None)
+
+
+class ModelRegistry:
+    """Registro en disco de modelos entrenados.
+
+    Cada versión se guarda como {nombre}.keras (modelo), {nombre}.scaler.pkl
+    (escalador) y {nombre}.json (métricas). El JSON se escribe el último, así
+    que una versión solo se considera completa cuando existe. Al guardar una
+    versión nueva se borran las anteriores del mismo símbolo y parámetros. Los
+    modelos cargados se mantienen en memoria para no leerlos de disco en cada
+    petición.
+    """
+
+    def __init__(self, directory, cache_size=8):
+        self.directory = directory
+        self._loaded = TTLCache(maxsize=cache_size, ttl=float('inf'))
+        os.makedirs(directory, exist_ok=True)
+
+    def _prefix(self, key):
+        symbol, training_period, sequence_length, _ = key
+        name = re.sub(r'[^A-Za-z0-9^=.\-]', '_', symbol)
+        return os.path.join(self.directory, f'{name}_{training_period}_{sequence_length}')
+
+    def _base(self, key):
+        return f'{self._prefix(key)}_{key[3]}'
+
+    def load(self, key):
+        """Modelo guardado para la clave, o None si no existe o está dañado"""
+        trained = self._loaded.get(key)
+        if trained is not None:
+            return trained
+
+        base = self._base(key)
+        if not os.path.exists(f'{base}.json'):
+            return None
+        try:
+            from tensorflow.keras.models import load_model
+            with open(f'{base}.json', encoding='utf-8') as f:
+                metadata = json.load(f)
+            trained = TrainedModel(
+                load_model(f'{base}.keras'),
+                joblib.load(f'{base}.scaler.pkl'),
+                metadata['metrics'],
+                metadata['trained_at'],
+                metadata.get('warm_start_from')
+            )
+        except Exception:
+            return None
+
+        self._loaded.set(key, trained)
+        return trained
+
+    def latest(self, key):
+        """Clave de la versión guardada más reciente de la misma serie, o None"""
+        versions = []
+        for path in glob.glob(f'{glob.escape(self._prefix(key))}_*.json'):
+            last_bar = os.path.basename(path)[:-len('.json')].rsplit('_', 1)[-1]
+            if re.fullmatch(r'\d{4}-\d{2}-\d{2}', last_bar):
+                versions.append(last_bar)
+        if not versions:
+            return None
+        return key[:3] + (max(versions),)
+
+    def save(self, key, trained):
+        """Guardar una versión nueva de forma atómica y eliminar las anteriores"""
+        base = self._base(key)
+        suffix = f'{os.getpid()}.{threading.get_ident()}.tmp'
+        metadata = {
+            'symbol': key[0],
+            'training_period': key[1],
+            'sequence_length': key[2],
+            'last_bar': key[3],
+            'trained_at': trained.trained_at,
+            'warm_start_from': trained.warm_start_from,
+            'metrics': trained.metrics
+        }
+
+        # Keras exige la extensión .keras también en el fichero temporal
+        trained.model.save(f'{base}.{suffix}.keras')
+        os.replace(f'{base}.{suffix}.keras', f'{base}.keras')
+        joblib.dump(trained.scaler, f'{base}.scaler.pkl.{suffix}')
+        os.replace(f'{base}.scaler.pkl.{suffix}', f'{base}.scaler.pkl')
+        with open(f'{base}.json.{suffix}', 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+        os.replace(f'{base}.json.{suffix}', f'{base}.json')
+
+        self._loaded.set(key, trained)
+        self._prune(key)
+
+    def _prune(self, key):
+        """Borrar las versiones de la misma serie entrenadas con datos anteriores"""
+        current = self._base(key)
+        for path in glob.glob(f'{glob.escape(self._prefix(key))}_*'):
+            if path.endswith('.tmp') or path.endswith('.tmp.keras') or path.startswith(f'{current}.'):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        for old_key in self._loaded.keys():
+            if old_key[:3] == key[:3] and old_key != key:
+                self._loaded.delete(old_key)
@@ -0,0 +1,107 @@
+import os
+import re
+import threading
+import pandas as pd
+
+
+class PriceStore:
+    """Almacén local de precios OHLCV: un fichero Parquet por símbolo e intervalo"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, symbol, interval):
+        name = re.sub(r'[^A-Za-z0-9^=.\-]', '_', symbol)
+        return os.path.join(self.directory, f'{name}_{interval}.parquet')
+
+    def lock(self, symbol, interval):
+        """Lock por fichero para serializar las actualizaciones de un mismo símbolo"""
+        with self._locks_lock:
+            return self._locks.setdefault((symbol, interval), threading.Lock())
+
+    def load(self, symbol, interval):
+        """Leer los datos guardados, o None si no existen o el fichero está dañado"""
+        path = self.path(symbol, interval)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_parquet(path)
+        except Exception:
+            return None
+
+    def save(self, symbol, interval, data):
+        """Escribir los datos de forma atómica (fichero temporal + rename)"""
+        path = self.path(symbol, interval)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        data.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+
+def merge_bars(stored, new):
+    """Unir barras nuevas a las guardadas; en fechas repetidas gana la más reciente"""
+    data = pd.concat([stored, new])
+    data = data[~data.index.duplicated(keep='last')]
+    return data.sort_index()
+
+
+def period_start(period, now):
+    """Fecha de inicio que cubre un período de yfinance ('1y', '6mo', 'ytd'...), o None para 'max'"""
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return now.normalize().replace(month=1, day=1)
+
+    match = re.fullmatch(r'(\d+)(wk|mo|y)', period)
+    if not match:
+        raise ValueError(f'Período no soportado: {period}')
+    amount, unit = int(match.group(1)), match.group(2)
+    offsets = {
+        'wk': pd.DateOffset(weeks=amount),
+        'mo': pd.DateOffset(months=amount),
+        'y': pd.DateOffset(years=amount)
+    }
+    return now.normalize() - offsets[unit]
+
+
+def trading_days(period):
+    """Número de sesiones para períodos en días ('2d', '5d'), o None para el resto"""
+    match = re.fullmatch(r'(\d+)d', period)
+    return int(match.group(1)) if match else None
+
+
+def covers_period(data, period, now, is_complete=False, tolerance_days=10):
+    """Indica si los datos guardados bastan para servir el período pedido.
+
+    is_complete indica que el fichero se descargó con period='max'. La
+    tolerancia absorbe fines de semana y festivos al inicio del período.
+    """
+    if is_complete:
+        return True
+    days = trading_days(period)
+    if days is not None:
+        return len(data) >= days
+    start = period_start(period, now)
+    if start is None:
+        return False
+    return data.index[0] <= start + pd.Timedelta(days=tolerance_days)
+
+
+def listed_within_period(data, period, now, margin_days=30):
+    """Indica si el símbolo cotiza desde hace menos que el período descargado"""
+    if period == 'max' or trading_days(period) is not None:
+        return False
+    return data.index[0] > period_start(period, now) + pd.Timedelta(days=margin_days)
+
+
+def slice_period(data, period, now):
+    """Recortar los datos guardados al período pedido"""
+    days = trading_days(period)
+    if days is not None:
+        return data.iloc[-days:]
+    start = period_start(period, now)
+    if start is None:
+        return data
+    return data[data.index >= start]
@@ -0,0 +1,221 @@
+import json
+import os
+import threading
+import time
+import pandas as pd
+import yfinance as yf
+from curl_cffi import requests as curl_requests
+from curl_cffi.requests.exceptions import HTTPError, RequestException
+from src.services.price_store import slice_period
+
+# Las sesiones se renuevan periódicamente para refrescar cookies y crumb
+SESSION_MAX_AGE = int(os.environ.get('MARKET_DATA_SESSION_MAX_AGE', 3600))
+
+
+def create_session():
+    """Sesión HTTP con keep-alive que imita a un navegador, como espera Yahoo"""
+    return curl_requests.Session(impersonate='chrome')
+
+
+def is_session_error(error):
+    """Indica si el error invalida la sesión (transporte, 401 o crumb rechazado).
+
+    Los errores de datos, como un símbolo inexistente, no justifican perder
+    las conexiones abiertas ni las cookies.
+    """
+    if isinstance(error, HTTPError):
+        response = getattr(error, 'response', None)
+        return response is not None and response.status_code == 401
+    if isinstance(error, RequestException):
+        return True
+    message = str(error)
+    return 'Unauthorized' in message or 'Invalid Crumb' in message
+
+
+class SharedSession:
+    """Sesión HTTP compartida por todas las descargas.
+
+    curl_cffi usa un handle por hilo dentro de la misma sesión, así que cada
+    hilo del pool reutiliza sus conexiones y todos comparten cookies. Si una
+    llamada falla por la propia sesión (ver is_session_error), reset() crea
+    una nueva; solo el primer hilo que informa del fallo la reemplaza, los
+    demás ya reciben la nueva.
+    """
+
+    def __init__(self, factory=create_session, max_age=SESSION_MAX_AGE):
+        self.factory = factory
+        self.max_age = max_age
+        self._session = None
+        self._created_at = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._session is None or time.monotonic() - self._created_at > self.max_age:
+                self._replace()
+            return self._session
+
+    def reset(self, failed_session):
+        with self._lock:
+            if self._session is failed_session:
+                self._replace()
+
+    def _replace(self):
+        # La sesión anterior no se cierra: otros hilos pueden estar usándola
+        self._session = self.factory()
+        self._created_at = time.monotonic()
+
+
+class YFinanceProvider:
+    """Proveedor de datos de mercado basado en yfinance, con una sesión HTTP compartida"""
+
+    name = 'yfinance'
+
+    def __init__(self, sessions=None):
+        self.sessions = sessions or SharedSession()
+
+    def _call(self, fn):
+        session = self.sessions.get()
+        try:
+            return fn(session)
+        except Exception as e:
+            if is_session_error(e):
+                self.sessions.reset(session)
+            raise
+
+    def history(self, symbol, period=None, interval='1d', start=None):
+        if start is not None:
+            return self._call(lambda session: yf.Ticker(symbol, session=session).history(start=start, interval=interval))
+        return self._call(lambda session: yf.Ticker(symbol, session=session).history(period=period, interval=interval))
+
+    def histories(self, symbols, period, interval='1d'):
+        """Descargar varios símbolos en una sola llamada: dict símbolo -> DataFrame"""
+        downloaded = self._call(lambda session: yf.download(
+            symbols, period=period, interval=interval, group_by='ticker',
+            auto_adjust=True, threads=True, progress=False, session=session
+        ))
+        frames = {}
+        for symbol in symbols:
+            data = _split_download(downloaded, symbol)
+            if data is not None and not data.empty:
+                frames[symbol] = data
+        return frames
+
+    def info(self, symbol):
+        return self._call(lambda session: yf.Ticker(symbol, session=session).info)
+
+    def metadata(self, symbol):
+        return self._call(lambda session: yf.Ticker(symbol, session=session).get_history_metadata())
+
+
+def _split_download(downloaded, symbol):
+    """Extraer las columnas de un símbolo del resultado de yf.download"""
+    if downloaded is None or downloaded.empty:
+        return None
+    if isinstance(downloaded.columns, pd.MultiIndex):
+        if symbol not in downloaded.columns.get_level_values(0):
+            return None
+        data = downloaded[symbol]
+    else:
+        data = downloaded
+    return data.dropna(how='all')
+
+
+class ReplayProvider:
+    """Proveedor que reproduce datos guardados en disco, para pruebas de carga y benchmarks.
+
+    Cada símbolo tiene un fichero {SYMBOL}.parquet o {SYMBOL}.csv con las columnas
+    OHLCV indexadas por fecha, y opcionalmente {SYMBOL}.json con su info. Los
+    períodos se calculan respecto a la última barra del fichero, de modo que los
+    resultados no dependen del día en que se ejecuten. latency añade una espera
+    fija (en segundos) a cada llamada para simular al proveedor real.
+    """
+
+    name = 'replay'
+
+    def __init__(self, directory, latency=0.0):
+        self.directory = directory
+        self.latency = latency
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _load(self, symbol):
+        with self._lock:
+            if symbol in self._frames:
+                return self._frames[symbol]
+
+        data = pd.DataFrame()
+        parquet_path = os.path.join(self.directory, f'{symbol}.parquet')
+        csv_path = os.path.join(self.directory, f'{symbol}.csv')
+        if os.path.exists(parquet_path):
+            data = pd.read_parquet(parquet_path)
+        elif os.path.exists(csv_path):
+            data = pd.read_csv(csv_path, index_col=0)
+            data.index = pd.to_datetime(data.index, utc=True)
+        if not data.empty:
+            data = data.sort_index()
+
+        with self._lock:
+            self._frames[symbol] = data
+        return data
+
+    def history(self, symbol, period=None, interval='1d', start=None):
+        self._wait()
+        data = self._load(symbol)
+        # Las fixtures contienen barras diarias
+        if data.empty or interval != '1d':
+            return pd.DataFrame()
+        if start is not None:
+            start = pd.Timestamp(start)
+            if start.tzinfo is None and data.index.tz is not None:
+                start = start.tz_localize(data.index.tz)
+            return data[data.index >= start]
+        return slice_period(data, period, data.index[-1])
+
+    def histories(self, symbols, period, interval='1d'):
+        self._wait()
+        frames = {}
+        for symbol in symbols:
+            data = self._load(symbol)
+            if not data.empty and interval == '1d':
+                frames[symbol] = slice_period(data, period, data.index[-1])
+        return frames
+
+    def info(self, symbol):
+        self._wait()
+        path = os.path.join(self.directory, f'{symbol}.json')
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def metadata(self, symbol):
+        info = self.info(symbol)
+        return {'longName': info.get('longName'), 'shortName': info.get('shortName')}
+
+
+def record_fixtures(symbols, directory, period='max'):
+    """Guardar datos reales de yfinance como fixtures para ReplayProvider"""
+    os.makedirs(directory, exist_ok=True)
+    provider = YFinanceProvider()
+    for symbol in symbols:
+        data = provider.history(symbol, period=period)
+        if data.empty:
+            continue
+        data.to_parquet(os.path.join(directory, f'{symbol}.parquet'))
+        with open(os.path.join(directory, f'{symbol}.json'), 'w', encoding='utf-8') as f:
+            json.dump(provider.info(symbol), f, default=str)
+
+
+def create_provider(name, replay_dir=None, replay_latency=0.0):
+    if name == 'yfinance':
+        return YFinanceProvider()
+    if name == 'replay':
+        if not replay_dir:
+            raise ValueError('MARKET_DATA_REPLAY_DIR es obligatorio con el proveedor replay')
+        return ReplayProvider(replay_dir, latency=replay_latency)
+    raise ValueError(f'Proveedor de datos desconocido: {name}')
@@ -0,0 +1,102 @@
+import os
+import queue
+import threading
+
+STREAM_INTERVAL = int(os.environ.get('QUOTE_STREAM_INTERVAL', 10))
+SUBSCRIBER_QUEUE_SIZE = 10
+
+
+class Subscriber:
+    def __init__(self, symbols):
+        self.symbols = set(symbols)
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def push(self, update):
+        """Encolar una actualización; si el cliente va lento se descarta la más antigua"""
+        while True:
+            try:
+                self.queue.put_nowait(update)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+class QuoteHub:
+    """Difunde cotizaciones a todos los clientes suscritos.
+
+    Un único hilo descarga cada símbolo distinto una vez por intervalo y reparte
+    el resultado, así la carga sobre el proveedor depende del número de símbolos
+    y no del número de pestañas abiertas. fetch_quotes(symbols) debe devolver un
+    dict símbolo -> resultado serializable.
+    """
+
+    def __init__(self, fetch_quotes, interval=STREAM_INTERVAL):
+        self.fetch_quotes = fetch_quotes
+        self.interval = interval
+        self._subscribers = set()
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def subscribe(self, symbols):
+        subscriber = Subscriber(symbols)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            latest = {s: self._latest[s] for s in subscriber.symbols if s in self._latest}
+            started = self._thread is None or not self._thread.is_alive()
+            if started:
+                # La primera pasada del hilo ya descarga todos los símbolos
+                self._wakeup.clear()
+                self._thread = threading.Thread(target=self._run, name='quote-hub', daemon=True)
+                self._thread.start()
+
+        # El cliente recibe enseguida lo último conocido y, si falta algo, se fuerza un refresco
+        if latest:
+            subscriber.push(latest)
+        if not started and len(latest) < len(subscriber.symbols):
+            self._wakeup.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscribed_symbols(self):
+        with self._lock:
+            return set().union(*(s.symbols for s in self._subscribers))
+
+    def _run(self):
+        while True:
+            symbols = self.subscribed_symbols()
+            if not symbols:
+                with self._lock:
+                    # Sin suscriptores el hilo termina; subscribe() lo vuelve a crear
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+                continue
+
+            try:
+                quotes = self.fetch_quotes(sorted(symbols))
+            except Exception as e:
+                quotes = {s: {'success': False, 'message': f'Error: {str(e)}'} for s in symbols}
+
+            with self._lock:
+                self._latest.update(quotes)
+                # Solo se conservan los símbolos que siguen suscritos
+                self._latest = {s: q for s, q in self._latest.items() if s in symbols}
+                subscribers = list(self._subscribers)
+
+            for subscriber in subscribers:
+                update = {s: quotes[s] for s in subscriber.symbols if s in quotes}
+                if update:
+                    subscriber.push(update)
+
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
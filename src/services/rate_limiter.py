@@ -0,0 +1,67 @@
+import heapq
+import itertools
+import threading
+import time
+
+# Clases de prioridad: un número menor se atiende antes
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DASHBOARD = 1
+PRIORITY_BACKGROUND = 2
+
+
+class RateLimitExceeded(Exception):
+    """No se obtuvo turno para llamar al proveedor dentro del tiempo de espera"""
+
+
+class PriorityRateLimiter:
+    """Token bucket con cola de prioridad para las llamadas salientes.
+
+    Se reponen rate tokens por segundo hasta un máximo de capacity. Cuando no
+    hay tokens, las peticiones esperan en cola y se atienden por prioridad y,
+    dentro de la misma prioridad, por orden de llegada. Con rate <= 0 no se limita.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=PRIORITY_DASHBOARD, cost=1, timeout=None):
+        if self.rate <= 0:
+            return
+        # Una descarga por lotes nunca puede costar más que el bucket completo
+        cost = min(cost, self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    is_next = self._waiters[0] == entry
+                    if is_next and self._tokens >= cost:
+                        self._tokens -= cost
+                        return
+
+                    # El primero de la cola espera a que haya tokens; el resto, a su turno
+                    wait = (cost - self._tokens) / self.rate if is_next else None
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            raise RateLimitExceeded('Demasiadas peticiones al proveedor de datos, inténtelo más tarde')
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
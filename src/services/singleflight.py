@@ -0,0 +1,49 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una sola ejecución.
+
+    La primera llamada envía la función al executor; las que llegan mientras
+    sigue en curso reciben el mismo Future, y cada una puede esperarlo con su
+    propio plazo.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Future de la ejecución en curso para la clave, o None"""
+        with self._lock:
+            return self._futures.get(key)
+
+    def claim(self, key):
+        """Reservar la clave antes de ejecutar: (Future, True) para quien debe
+        completarlo, o (Future en curso, False) para el resto"""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._futures[key] = future
+
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future, True
+
+    def submit(self, key, executor, fn, *args, **kwargs):
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future
+            future = executor.submit(fn, *args, **kwargs)
+            self._futures[key] = future
+
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
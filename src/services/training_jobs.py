@@ -0,0 +1,98 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.services.cache import TTLCache
+from src.services.singleflight import SingleFlight
+
+
+class TrainingJob:
+    """Trabajo de entrenamiento enviado al pool; context guarda lo necesario para responder"""
+
+    def __init__(self, future, context=None):
+        self.id = uuid.uuid4().hex
+        self.future = future
+        self.context = context or {}
+        self.created_at = time.time()
+        self.result = None
+
+    @property
+    def status(self):
+        if not self.future.done():
+            return 'running' if self.future.running() else 'queued'
+        if self.future.cancelled() or self.future.exception() is not None:
+            return 'failed'
+        return 'done'
+
+    @property
+    def error(self):
+        if self.future.cancelled():
+            return 'Entrenamiento cancelado'
+        exception = self.future.exception()
+        return str(exception) if exception is not None else None
+
+
+class TrainingPool:
+    """Pool de procesos para entrenar modelos sin bloquear los hilos de Flask.
+
+    max_workers limita los entrenamientos simultáneos; el resto espera en cola.
+    Los procesos se crean con 'spawn' (TensorFlow no admite fork) y solo al
+    enviar el primer trabajo. Peticiones con la misma clave comparten un único
+    entrenamiento, aunque cada una recibe su propio identificador de trabajo.
+    Los trabajos pendientes se conservan hasta que terminan; los terminados
+    se olvidan job_ttl segundos después de terminar.
+    """
+
+    def __init__(self, max_workers=1, job_ttl=3600, max_jobs=1024):
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._inflight = SingleFlight()
+        self._jobs = TTLCache(maxsize=max_jobs, ttl=job_ttl)
+        # Trabajos en cola o en ejecución: no caducan ni se desalojan
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            return self._executor
+
+    def _replace_executor(self, broken):
+        with self._executor_lock:
+            if self._executor is broken:
+                self._executor = self._create_executor()
+            return self._executor
+
+    def submit(self, key, fn, *args, context=None):
+        executor = self._get_executor()
+        try:
+            future = self._inflight.submit(key, executor, fn, *args)
+        except BrokenProcessPool:
+            # Un proceso murió (p. ej. sin memoria): se recrea el pool
+            future = self._inflight.submit(key, self._replace_executor(executor), fn, *args)
+        job = TrainingJob(future, context)
+        with self._pending_lock:
+            self._pending[job.id] = job
+        future.add_done_callback(lambda f: self._finish(job))
+        return job
+
+    def _finish(self, job):
+        # job_ttl empieza a contar al terminar
+        with self._pending_lock:
+            self._pending.pop(job.id, None)
+            self._jobs.set(job.id, job)
+
+    def get(self, job_id):
+        with self._pending_lock:
+            job = self._pending.get(job_id)
+        return job if job is not None else self._jobs.get(job_id)